@@ -1,13 +1,35 @@
 import os
+import re
 import io
-from azure.identity import AzureCliCredential, ManagedIdentityCredential
-from azure.storage.blob import BlobServiceClient
+import base64
+import gc
+import gzip
+import hashlib
+import math
+import tempfile
+import time
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
 import logging
 import json
 from flask import Flask, render_template, jsonify, request, send_file
 from dotenv import load_dotenv
 from datetime import datetime
+import numpy as np
 import pandas as pd
+import xlsxwriter
+from blob_storage import get_container_client
+from cache import DataCache, DataCacheLRU, DerivedCache, ResponseCache
+from snapshot import SNAPSHOT_DIR, map_table, read_snapshot, snapshots_enabled, write_snapshot, write_table
+from scenarios import SCENARIO_ACTIONS, open_scenario_store
+from search import EmployeeSearchIndex
+from shared_data import SharedFrame, shared_data_enabled
+from trends import TREND_GROUPS, TREND_KEYS, compact_rollup, rollup_cost, rollup_revenue, trend_series
+
+try:
+    import brotli
+except ImportError:  # Optional, responses fall back to gzip
+    brotli = None
 
 load_dotenv()
 
@@ -18,77 +40,211 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 
 app = Flask(__name__)
 
-_cached_rac_data = None
-_cache_timestamp = None
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 3600))
 
-_cached_prism_data = None
-_prism_cache_timestamp = None
+# Default quarter of the cost data, see quarter_from_args
+max_quarter = 'Q1FY2026'
+QUARTER_PATTERN = re.compile(r'Q[1-4]FY\d{4}')
+QUARTER_CACHE_MAX_MB = int(os.environ.get('QUARTER_CACHE_MAX_MB', 2048))
+
+# Cost data per quarter, loaded on first use; the default quarter is never evicted
+cost_caches = DataCacheLRU(
+    'rac', lambda quarter: get_data(quarter), lambda df: int(df.memory_usage(deep=True).sum()),
+    QUARTER_CACHE_MAX_MB * 1024 ** 2, pinned=[max_quarter], on_evict=lambda quarter: forget_quarter(quarter),
+    ttl=CACHE_TTL_SECONDS
+)
+rac_cache = cost_caches.cache(max_quarter)
+prism_cache = DataCache('prism', lambda: load_prism_data(), ttl=CACHE_TTL_SECONDS)
+permissions_cache = DataCache('permissions', lambda: load_user_permissions(), ttl=CACHE_TTL_SECONDS)
+plan_cache = DataCache('plan', lambda: load_plan_data(), ttl=CACHE_TTL_SECONDS)
+odc_cache = DataCache('odc', lambda: load_odc_data(), ttl=CACHE_TTL_SECONDS)
+DATA_CACHES = (rac_cache, prism_cache, permissions_cache, plan_cache, odc_cache)
+
+RESPONSE_CACHE_MB = int(os.environ.get('RESPONSE_CACHE_MB', 64))
+response_cache = ResponseCache(RESPONSE_CACHE_MB * 1024 ** 2)
+derived_data = DerivedCache()
+
+# (container, blob) -> (etag, parsed DataFrame)
+_blob_csv_cache = {}
+# 'container/blob' -> SharedFrame
+_shared_frames = {}
+
+def read_blob_csv(container_name, blob_name, transform=None, columns=None, dtype=None, snapshot=False, shared=False):
+    """Download and parse a CSV blob, skipping both while its ETag is unchanged
+
+    The download is conditional on the ETag seen last time. When the blob has
+    not changed the previously parsed (and transformed) object is returned
+    as-is, so the data caches only extend its lifetime.
+
+    columns limits parsing to those columns and dtype is passed on to
+    read_csv. With snapshot=True the parsed data is also stored as a local
+    columnar snapshot, so a cold start only needs a properties call and a
+    memory map while the blob is unchanged.
+
+    With shared=True and SHARED_DATA_DIR set, the transformed frame is loaded
+    by one process on the host and memory-mapped by the others. No private copy
+    is kept, the conditional download uses the ETag of the published frame.
+    """
+    if shared and shared_data_enabled():
+        name = f"{container_name}/{blob_name}"
+        shared_frame = _shared_frames.get(name)
+        if shared_frame is None:
+            loader = lambda etag: _load_blob_csv(container_name, blob_name, transform, columns, dtype, snapshot, etag)
+            shared_frame = _shared_frames.setdefault(name, SharedFrame(name, loader, ttl=CACHE_TTL_SECONDS))
+        return shared_frame.load()
+
+    key = (container_name, blob_name)
+    cached = _blob_csv_cache.get(key)
+    etag, df = _load_blob_csv(container_name, blob_name, transform, columns, dtype, snapshot,
+                              cached[0] if cached is not None else None)
+    if df is None:
+        return cached[1]
+    _blob_csv_cache[key] = (etag, df)
+    return df
+
+def _load_blob_csv(container_name, blob_name, transform, columns, dtype, snapshot, etag=None):
+    """Return (etag, transformed data) for a CSV blob, or (etag, None) while it still has the given ETag"""
+    blob_client = get_container_client(container_name).get_blob_client(blob_name)
+    snapshot_name = f"{container_name}/{blob_name}"
+
+    if etag is None and snapshot and snapshots_enabled():
+        current_etag = blob_client.get_blob_properties().etag
+        df = read_snapshot(snapshot_name, current_etag)
+        if df is not None:
+            return current_etag, df if transform is None else transform(df)
 
-def get_credential():
-    '''Get the credential based on the environment'''
-    # Check if running in Azure (presence of IDENTITY_ENDPOINT environment variable)
-    if "IDENTITY_ENDPOINT" in os.environ:
-        return ManagedIdentityCredential()
+    try:
+        if etag is None:
+            download_stream = blob_client.download_blob()
+        else:
+            download_stream = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+    except HttpResponseError as e:
+        if etag is not None and e.status_code == 304:
+            return etag, None
+        raise
+
+    usecols = None
+    if columns is not None:
+        # Tolerate columns that are missing from the file
+        usecols = lambda column: column in columns
+
+    content = io.BytesIO(download_stream.readall())
+    df = pd.read_csv(content, low_memory=False, usecols=usecols, dtype=dtype)
+    etag = download_stream.properties.etag
+    if snapshot:
+        write_snapshot(snapshot_name, df, etag)
+
+    return etag, df if transform is None else transform(df)
+
+def blob_csv_etag(container_name, blob_name, df):
+    """ETag of the blob df was read at, if it is what read_blob_csv last returned for it, else None"""
+    shared_frame = _shared_frames.get(f"{container_name}/{blob_name}")
+    if shared_frame is not None:
+        shared_df, etag = shared_frame.attached()
     else:
-        return AzureCliCredential()
-
-def get_cached_prism_data():
-    global _cached_prism_data, _prism_cache_timestamp
+        etag, shared_df = _blob_csv_cache.get((container_name, blob_name), (None, None))
+    return etag if shared_df is df else None
 
-    current_time = datetime.now()
-    if (_cached_prism_data is None or _prism_cache_timestamp is None or 
-        (current_time - _prism_cache_timestamp).seconds > 3600):
-        _cached_prism_data = load_prism_data()
-        _prism_cache_timestamp = current_time
+def forget_blob_csv(container_name, blob_name):
+    """Drop the parsed copy of a blob kept by read_blob_csv"""
+    _blob_csv_cache.pop((container_name, blob_name), None)
+    _shared_frames.pop(f"{container_name}/{blob_name}", None)
 
-    return _cached_prism_data
+def get_cached_prism_data():
+    return prism_cache.get()
 
 def load_prism_data():
     """Load prism data from Azure storage"""
     try:
-        account_url = "https://sonataonefpa.blob.core.windows.net/"
-        container_name = "testpoccontainer"
-        credential = get_credential()
-        blob_service_client = BlobServiceClient(account_url, credential=credential)
-        container_client = blob_service_client.get_container_client(container_name)
-        
-        # Download prism.csv
-        prism_blob_client = container_client.get_blob_client("prism.csv")
-        prism_download_stream = prism_blob_client.download_blob()
-        prism_content = io.BytesIO(prism_download_stream.readall())
-        prism_df = pd.read_csv(prism_content, low_memory=False)
-
-        # rename Microsoft GlobalAct to MS Global
-        prism_df['BU'] = prism_df['BU'].replace('Microsoft GlobalAct', 'MS Global') 
-        
-        return prism_df
+        return read_blob_csv("testpoccontainer", "prism.csv", transform=prepare_prism_data, snapshot=True, shared=True)
     except Exception as e:
         app.logger.error(f"Error loading prism data: {e}")
         return pd.DataFrame()
 
-def get_cached_data():
-    global _cached_rac_data, _cache_timestamp
-
-    current_time = datetime.now()
-    if (_cached_rac_data is None or _cache_timestamp is None  or (current_time - _cache_timestamp).seconds > 3600):
-        _cached_rac_data = get_data()
-        _cache_timestamp = current_time
-
-    return _cached_rac_data
-
-_cached_permissions_data = None
-_permissions_cache_timestamp = None
+def prepare_prism_data(prism_df):
+    # rename Microsoft GlobalAct to MS Global
+    prism_df['BU'] = prism_df['BU'].replace('Microsoft GlobalAct', 'MS Global') 
+    if 'FinancialYear' in prism_df.columns:
+        prism_df['FinancialYear'] = normalize_financial_year(prism_df['FinancialYear'])
+    return prism_df
+
+def normalize_financial_year(years):
+    """Write financial years such as 2026, '26', 'fy26' or 'FY2025-26' as 'FY2026', as quarters do
+
+    Values without a trailing year are kept as they are.
+    """
+    text = years.astype(str).str.strip().str.upper().str.replace(r'\.0+$', '', regex=True)
+    end_year = text.str.extract(r'(\d{4}|\d{2})$')[0]
+    end_year = end_year.where(end_year.str.len() != 2, '20' + end_year)
+    return ('FY' + end_year).where(end_year.notna(), years)
+
+def cost_cache(quarter=max_quarter):
+    return cost_caches.cache(quarter)
+
+def get_cached_data(quarter=max_quarter):
+    return cost_cache(quarter).get()
+
+def get_derived_data(name, builder, quarter=max_quarter):
+    """Return a dataset derived from a quarter's cost data, building it once per cache refresh"""
+    return derived_data.get(f'{name}:{quarter}', builder, cost_cache(quarter))
+
+def forget_quarter(quarter):
+    """Drop everything still holding an evicted quarter's cost data"""
+    derived_data.discard(lambda name: name.endswith(f':{quarter}'))
+    forget_blob_csv("rac-gm", cost_blob(quarter))
+
+def cost_blob_etags():
+    """Quarter -> ETag of its cost file, oldest quarter first"""
+    etags = {}
+    for blob in get_container_client("rac-gm").list_blobs(name_starts_with="cost/"):
+        match = re.fullmatch(r'cost/(Q[1-4]FY\d{4})\.csv', blob.name)
+        if match:
+            etags[match.group(1)] = blob.etag
+    # Q4 ends the fiscal year
+    return dict(sorted(etags.items(), key=lambda item: (item[0][4:], item[0][:2])))
+
+def list_cost_quarters():
+    """Quarters with a cost file, oldest first"""
+    return list(cost_blob_etags())
+
+quarters_cache = DataCache('quarters', list_cost_quarters, ttl=CACHE_TTL_SECONDS)
+
+def quarter_from_args(args):
+    """Return (quarter, error response) for the optional quarter argument, e.g. Q2FY2026"""
+    quarter = args.get('quarter') or max_quarter
+    if not QUARTER_PATTERN.fullmatch(quarter):
+        return None, (jsonify({'error': 'quarter must look like Q1FY2026'}), 400)
+    if quarter != max_quarter and quarter not in quarters_cache.get():
+        return None, (jsonify({'error': f'No data for quarter {quarter}'}), 404)
+    return quarter, None
 
 def get_cached_permissions():
-    global _cached_permissions_data, _permissions_cache_timestamp
+    return permissions_cache.get()
+
+def build_permissions_index(permissions_df):
+    """Map each lower-cased email to its BUs, or None when the user sees all BUs
+
+    Expects 'Email' and 'BU' columns, where BU is 'All' or a comma-separated
+    list. The first row for an email wins.
+    """
+    permissions = {}
+    if permissions_df.empty:
+        return permissions
+
+    for email, bu_value in zip(permissions_df['Email'], permissions_df['BU']):
+        if not isinstance(email, str):
+            continue
+        email = email.lower()
+        if email in permissions:
+            continue
+        if bu_value == 'All':
+            permissions[email] = None
+        else:
+            permissions[email] = frozenset(bu.strip() for bu in str(bu_value).split(','))
 
-    current_time = datetime.now()
-    if (_cached_permissions_data is None or _permissions_cache_timestamp is None or 
-        (current_time - _permissions_cache_timestamp).seconds > 3600):
-        _cached_permissions_data = load_user_permissions()
-        _permissions_cache_timestamp = current_time
+    return permissions
 
-    return _cached_permissions_data
+_USER_NOT_FOUND = object()
 
 def get_user_bus():
     """Get the BUs accessible to current user based on permissions.csv"""
@@ -99,58 +255,32 @@ def get_user_bus():
         return []  # Return empty list = no data shown
     
     try:
-        permissions_df = get_cached_permissions()
+        permissions = get_cached_permissions()
         
-        if permissions_df.empty:
+        if not permissions:
             app.logger.warning("Permissions data is empty, no data will be shown")
             return []  # No data shown if permissions file unavailable
         
-        # Find user's row (assuming columns are 'Email' and 'BU')
-        user_row = permissions_df[permissions_df['Email'].str.lower() == user_email.lower()]
+        # None means 'All' = show all data
+        user_bus = permissions.get(user_email.lower(), _USER_NOT_FOUND)
         
-        if user_row.empty:
+        if user_bus is _USER_NOT_FOUND:
             app.logger.info(f"User {user_email} not found in permissions file, no data will be shown")
             return []  # User not in permissions = no data shown
         
-        bu_value = user_row['BU'].iloc[0]
-        
-        # Handle 'All' case
-        if bu_value == 'All':
-            return None  # No filtering needed = show all data
-        
-        # Handle multiple BUs separated by commas
-        if ',' in str(bu_value):
-            bus = [bu.strip() for bu in str(bu_value).split(',')]
-            return bus
-        else:
-            # Single BU
-            return [str(bu_value).strip()]
+        return user_bus
             
     except Exception as e:
         app.logger.error(f"Error getting user BUs for {user_email}: {e}")
         return []  # Return empty list on error = no data shown
 
-max_quarter = 'Q1FY2026'
-
 def load_user_permissions():
-    """Load user permissions from Azure storage"""
+    """Load user permissions from Azure storage, indexed by email"""
     try:
-        account_url = "https://sonataonefpa.blob.core.windows.net/"
-        container_name = "testpoccontainer"
-        credential = get_credential()
-        blob_service_client = BlobServiceClient(account_url, credential=credential)
-        container_client = blob_service_client.get_container_client(container_name)
-        
-        # Download permissions.csv
-        permissions_blob_client = container_client.get_blob_client("permissions.csv")
-        permissions_download_stream = permissions_blob_client.download_blob()
-        permissions_content = io.BytesIO(permissions_download_stream.readall())
-        permissions_df = pd.read_csv(permissions_content, low_memory=False)
-        
-        return permissions_df
+        return read_blob_csv("testpoccontainer", "permissions.csv", transform=build_permissions_index)
     except Exception as e:
         app.logger.error(f"Error loading permissions: {e}")
-        return pd.DataFrame()  # Return empty DataFrame on error
+        return {}  # No permissions on error
 
 
 def get_current_user():
@@ -166,80 +296,157 @@ def get_current_user():
     
     
 
-def get_data():
-    account_url = "https://sonataonefpa.blob.core.windows.net/"
-    container_name = "rac-gm"
-    credential = get_credential()
-    blob_service_client = BlobServiceClient(account_url, credential=credential)
-    container_client = blob_service_client.get_container_client(container_name)
-    
-    # Download Q1FY2026.csv
-    cost_blob_client = container_client.get_blob_client("cost/Q1FY2026.csv")
-    cost_download_stream = cost_blob_client.download_blob()
-    cost_content = io.BytesIO(cost_download_stream.readall())
-    cost_df = pd.read_csv(cost_content, low_memory=False)
-    
-    return cost_df
+def cost_blob(quarter):
+    return f"cost/{quarter}.csv"
+
+COST_BLOB = cost_blob(max_quarter)
+
+def get_data(quarter=max_quarter, shared=True):
+    return read_blob_csv(
+        "rac-gm", cost_blob(quarter), transform=apply_cost_schema,
+        columns=COST_COLUMNS, dtype=COST_DTYPES, snapshot=True, shared=shared
+    )
 
-def load_employees(bu_filter: list | None = None):
+def load_plan_data():
+    return read_blob_csv("testpoccontainer", "plan.csv", snapshot=True, shared=True)
+
+def load_odc_data():
+    return read_blob_csv("testpoccontainer", "odc.csv", snapshot=True, shared=True)
+
+ROSTER_GROUPING_COLUMNS = [
+    'EmployeeCode', 'EmployeeName', 'Band', 'Offshore_Onsite',
+    'FinalBU', 'FinalCustomer', 'PrismCustomerGroup',
+    'ProjectRole', 'Sub-Practice', 'Practice', 'BillableYN'
+]
+
+ROSTER_COLUMNS = ROSTER_GROUPING_COLUMNS + [
+    'AllocationFTECapped_M1', 'AllocationFTECapped_M2', 'AllocationFTECapped_M3', 'AllocationFTECapped_QTR',
+    'TotalFTECapped_M1', 'TotalFTECapped_M2', 'TotalFTECapped_M3', 'TotalFTECapped_QTR',
+    'TotalCost_M1', 'TotalCost_M2', 'TotalCost_M3', 'TotalCost_QTR'
+]
+
+# Every cost column the app reads; the rest of the file is never parsed
+COST_COLUMNS = set(ROSTER_COLUMNS + [
+    'AllocationCost_M1', 'AllocationCost_M2', 'AllocationCost_M3', 'AllocationCost_QTR',
+    'Quarter'
+])
+
+# Repeated text columns are stored once per distinct value as categories
+COST_CATEGORY_COLUMNS = [
+    'EmployeeName', 'Band', 'Offshore_Onsite', 'FinalBU', 'FinalCustomer', 'PrismCustomerGroup',
+    'ProjectRole', 'Sub-Practice', 'Practice', 'BillableYN', 'Quarter'
+]
+
+COST_DTYPES = {column: 'category' for column in COST_CATEGORY_COLUMNS}
+
+def downcast_lossless(series):
+    """Narrow an integer or float column when no value changes"""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if series.dtype == np.float64:
+        narrowed = series.astype(np.float32)
+        if ((narrowed.astype(np.float64) == series) | series.isna()).all():
+            return narrowed
+    return series
+
+def apply_cost_schema(df):
+    """Store the cost data with categorical dimensions and narrowed numbers
+
+    Also applied to snapshots, which may predate the schema.
+    """
+    for column in COST_CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in df.select_dtypes('number').columns:
+        df[column] = downcast_lossless(df[column])
+
+    app.logger.info(f"Cost data: {len(df)} rows, {frame_memory_mb(df):.1f} MB in memory")
+    return df
+
+def decategorize(df):
+    """Turn category columns back into plain columns, for small derived frames"""
+    for column in df.select_dtypes('category').columns:
+        df[column] = df[column].astype(df[column].cat.categories.dtype)
+    return df
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def current_rss_mb():
+    """Resident memory of this process in MB, or None where /proc is unavailable"""
     try:
-        df = get_cached_data()
-        relevant_columns = [
-            'EmployeeCode', 
-            'EmployeeName',
-            'Band',
-            'Offshore_Onsite',
-            'FinalBU', 
-            'FinalCustomer',
-            'PrismCustomerGroup',
-            'ProjectRole',
-            'Sub-Practice', 
-            'Practice',
-            'BillableYN',
-            'AllocationFTECapped_M1',
-            'AllocationFTECapped_M2',
-            'AllocationFTECapped_M3',
-            'AllocationFTECapped_QTR',
-            'TotalFTECapped_M1',
-            'TotalFTECapped_M2',
-            'TotalFTECapped_M3',
-            'TotalFTECapped_QTR',
-            'TotalCost_M1',
-            'TotalCost_M2',
-            'TotalCost_M3',
-            'TotalCost_QTR',
-        ]
-        df = df[relevant_columns]
-        columns_to_concat = ['EmployeeCode', 'EmployeeName', 'Band', 'Offshore_Onsite', 
-                     'FinalBU', 'FinalCustomer', 'PrismCustomerGroup', 
-                     'ProjectRole', 'Sub-Practice', 'Practice', 'BillableYN']
-        df.loc[:, 'BillableYN'] = df['BillableYN'].map({'Y': True, 'N': False})
-        grouped_df = df.groupby(columns_to_concat).sum(numeric_only=True).reset_index()
-        grouped_df['id'] = grouped_df[columns_to_concat].astype(str).agg(''.join, axis=1)
-        grouped_df['CPC_M1'] = grouped_df['TotalCost_M1'] / grouped_df['TotalFTECapped_M1']
-        grouped_df['CPC_M2'] = grouped_df['TotalCost_M2'] / grouped_df['TotalFTECapped_M2']
-        grouped_df['CPC_M3'] = grouped_df['TotalCost_M3'] / grouped_df['TotalFTECapped_M3']
-        grouped_df['CPC_QTR'] = grouped_df['TotalCost_QTR'] / grouped_df['TotalFTECapped_QTR'] / 3
-        
-        if bu_filter is None:
-            filtered_df = grouped_df.copy()
-        elif len(bu_filter) == 0:
-            filtered_df = pd.DataFrame(columns=grouped_df.columns)
-        else:
-            filtered_df = grouped_df[grouped_df['FinalBU'].isin(bu_filter)].reset_index(drop=True)
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def build_roster(df):
+    """Group the cost data into the roster and the employee pool view without costs"""
+    df = df[ROSTER_COLUMNS].copy()
+    df['BillableYN'] = df['BillableYN'].map({'Y': True, 'N': False})
+    # Grouping on the category codes; only observed combinations are kept
+    grouped_df = df.groupby(ROSTER_GROUPING_COLUMNS, observed=True).sum(numeric_only=True).reset_index()
+    grouped_df = decategorize(grouped_df)
+
+    # Column-wise concatenation instead of a row-wise join over every row
+    ids = grouped_df[ROSTER_GROUPING_COLUMNS[0]].astype(str)
+    for column in ROSTER_GROUPING_COLUMNS[1:]:
+        ids = ids + grouped_df[column].astype(str)
+    grouped_df['id'] = ids
+
+    grouped_df['CPC_M1'] = grouped_df['TotalCost_M1'] / grouped_df['TotalFTECapped_M1']
+    grouped_df['CPC_M2'] = grouped_df['TotalCost_M2'] / grouped_df['TotalFTECapped_M2']
+    grouped_df['CPC_M3'] = grouped_df['TotalCost_M3'] / grouped_df['TotalFTECapped_M3']
+    grouped_df['CPC_QTR'] = grouped_df['TotalCost_QTR'] / grouped_df['TotalFTECapped_QTR'] / 3
+
+    total_fte_idx = grouped_df.columns.get_loc('TotalFTECapped_M1')
+    columns_to_drop = grouped_df.columns[total_fte_idx:].drop('id')
+    without_ctc = grouped_df.drop(columns=columns_to_drop)
+    return grouped_df, without_ctc
+
+def get_roster(quarter=max_quarter):
+    return get_derived_data('roster', build_roster, quarter)
+
+def partition_by_bu(df, column='FinalBU'):
+    """Split a frame into pre-sliced frames per business unit
+
+    Each partition keeps the original index so rows from several partitions can
+    be put back into the frame's order.
+    """
+    return {bu: part for bu, part in df.groupby(column, sort=False, observed=True)}
+
+def select_bu_partitions(df, partitions, user_bus):
+    """Assemble the rows of df visible to a user from its BU partitions
+
+    None means the user sees every BU and an empty list means they see nothing.
+    """
+    if user_bus is None:
+        return df
+
+    parts = [partitions[bu] for bu in dict.fromkeys(user_bus) if bu in partitions]
+    if not parts:
+        return df.iloc[0:0]
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    return pd.concat(parts).sort_index().reset_index(drop=True)
+
+def get_roster_partitions(quarter=max_quarter):
+    return get_derived_data('roster_partitions', lambda df: partition_by_bu(get_roster(quarter)[1]), quarter)
 
-        total_fte_idx = filtered_df.columns.get_loc('TotalFTECapped_M1')
-        columns_to_drop = filtered_df.columns[total_fte_idx:]
-        columns_to_drop = columns_to_drop.drop('id')
-        filtered_df.drop(columns=columns_to_drop, inplace=True)
-        without_ctc = grouped_df.drop(columns=columns_to_drop, inplace=False)
+def load_employees(bu_filter: list | None = None, quarter=max_quarter):
+    """Return the full roster, the user's roster and the employee pool
+
+    The frames are shared between requests and must not be modified in place.
+    """
+    try:
+        grouped_df, without_ctc = get_roster(quarter)
+        filtered_df = select_bu_partitions(without_ctc, get_roster_partitions(quarter), bu_filter)
         return grouped_df, filtered_df, without_ctc
     except Exception as e:
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
 
-
-
 @app.route('/api/download-roster-analysis', methods=['POST'])
 def download_roster_analysis():    
     # Get audit log, filters, and GM summary from POST data
@@ -255,19 +462,30 @@ def download_roster_analysis():
         audit_log = []
         filters = {}
         gm_summary = {}
+
+    # A saved scenario replaces the posted audit log
+    scenario_id = request.form.get('scenario_id')
+    if scenario_id:
+        audit_log = scenario_store.entries(scenario_id, get_current_user()['email'])
+        if audit_log is None:
+            return jsonify({'error': 'Scenario not found'}), 404
     
+    quarter, error_response = quarter_from_args(request.form)
+    if error_response:
+        return error_response
+
     # Get current roster data with filters applied
     user_bus = get_user_bus()
-    _, df, _ = load_employees(user_bus)
+    _, df, _ = load_employees(user_bus, quarter)
     
     if df.empty:
         # Create empty file if no data
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            pd.DataFrame([{'Message': 'No data available'}]).to_excel(writer, sheet_name='Info', index=False)
+        output = tempfile.TemporaryFile()
+        with new_workbook(output) as workbook:
+            write_sheet(workbook, 'Info', pd.DataFrame([{'Message': 'No data available'}]))
         output.seek(0)
         return send_file(output, as_attachment=True, download_name='roster-analysis-empty.xlsx',
-                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                        mimetype=EXCEL_MIMETYPE)
     
     # Apply filters to the data
     filtered_df = apply_filters_to_dataframe(df, filters)
@@ -275,28 +493,17 @@ def download_roster_analysis():
     # Apply audit log to get current state
     roster_data = apply_audit_log_to_dataframe(filtered_df, audit_log)
     
-    filtered_revenue = pd.DataFrame()
-    filtered_cost = pd.DataFrame()
-    cost_df = pd.DataFrame()  # Ensure cost_df is always defined
-
     try:
-        prism_df = get_cached_prism_data()
-        cost_df = get_cached_data()
-        
-        quarter_formatted = 'Q1'  # Extract from max_quarter if needed
-        filtered_revenue = prism_df[prism_df['Quarter'] == quarter_formatted].reset_index(drop=True)
-        filtered_revenue.rename(columns={'Title': 'Customer'}, inplace=True)
-        selected_month = gm_summary.get('selectedMonth', 'Quarter')
-
-            
+        revenue_cube = get_revenue_cube()
+        allocation_cube = get_allocation_cube(quarter)
     except Exception as e:
         print(f"Error loading revenue data: {e}")
-        filtered_revenue = pd.DataFrame()
-        cost_df = pd.DataFrame()
+        revenue_cube = build_revenue_cube(pd.DataFrame())
+        allocation_cube = build_allocation_cube(pd.DataFrame())
     
     # Create Excel file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    output = tempfile.TemporaryFile()
+    with new_workbook(output) as workbook:
         # Sheet 1: Current Allocations
         allocations_df = roster_data[['EmployeeName', 'Band', 'FinalBU', 'PrismCustomerGroup', 
                                     'Offshore_Onsite', 'BillableYN']].copy()
@@ -308,7 +515,7 @@ def download_roster_analysis():
             
         allocations_df.columns = ['Employee Name', 'Band', 'Business Unit', 'Customer', 
                                 'Location', 'Billable', 'Current FTE']
-        allocations_df.to_excel(writer, sheet_name='Current Allocations', index=False)
+        write_sheet(workbook, 'Current Allocations', allocations_df)
         
         
         # Sheet 3: Revenue Summary
@@ -319,18 +526,8 @@ def download_roster_analysis():
         selected_bu = gm_summary.get('selectedBU', 'All')
         selected_month = gm_summary.get('selectedMonth', 'Quarter')
 
-        total_base_revenue = 0
-        if not filtered_revenue.empty:
-            temp_revenue = filtered_revenue.copy()
-            if filters.get('selectedCustomers'):
-                temp_revenue = temp_revenue[temp_revenue['Customer'].isin(filters['selectedCustomers'])]
-            
-            if selected_month == 'Quarter':
-                total_base_revenue = temp_revenue['Total_Revenue'].sum() * 1000000
-            else:
-                if selected_month in ['M1', 'M2', 'M3']:
-                    month_filtered = temp_revenue[temp_revenue['Month'].str.contains(selected_month, na=False)]
-                    total_base_revenue = month_filtered['Total_Revenue'].sum() * 1000000
+        total_base_revenue = revenue_total(revenue_cube, quarter, selected_month,
+                                           'Customer', filters.get('selectedCustomers'))
 
         additional_revenue_value = 0
         try:
@@ -351,17 +548,8 @@ def download_roster_analysis():
             current_odc = 0
 
         if total_base_revenue > 0:
-            if not filtered_revenue.empty:
-                temp_revenue = filtered_revenue.copy()
-                if filters.get('selectedBusinessUnits'):
-                    temp_revenue = temp_revenue[temp_revenue['BU'].isin(filters['selectedBusinessUnits'])]
-                
-                if selected_month == 'Quarter':
-                    bu_revenue = temp_revenue['Total_Revenue'].sum() * 1000000
-                else:
-                    if selected_month in ['M1', 'M2', 'M3']:
-                        month_filtered = temp_revenue[temp_revenue['Month'].str.contains(selected_month, na=False)]
-                        bu_revenue = month_filtered['Total_Revenue'].sum() * 1000000
+            bu_revenue = revenue_total(revenue_cube, quarter, selected_month,
+                                       'BU', filters.get('selectedBusinessUnits'))
 
             summary_data.append({
                 'Type': 'Base Revenue',
@@ -380,14 +568,8 @@ def download_roster_analysis():
         customer_total_revenue = total_base_revenue
         bu_total_revenue = bu_revenue
 
-        filtered_df = cost_df.loc[cost_df['FinalBU'] == selected_bu].reset_index(drop=True)
-        customer_df = filtered_df.loc[filtered_df['PrismCustomerGroup'] == selected_customer].reset_index(drop=True)
-
-        allocation_cost_col = 'AllocationCost_QTR'
-        if selected_month in ['M1', 'M2', 'M3']:
-            allocation_cost_col = f'AllocationCost_{selected_month}'
-        bu_allocation_cost = filtered_df[allocation_cost_col].sum()
-        customer_allocation_cost = customer_df[allocation_cost_col].sum()
+        bu_allocation_cost = allocation_cost(allocation_cube, selected_month, selected_bu)
+        customer_allocation_cost = allocation_cost(allocation_cube, selected_month, selected_bu, selected_customer)
 
 
         summary_data.append({
@@ -483,8 +665,9 @@ def download_roster_analysis():
             # Get BU from the selected customer
             selected_bu = None
             if filters.get('selectedCustomers') and len(filters['selectedCustomers']) == 1:
-                # Find the BU for this customer from the filtered revenue data
-                customer_data = filtered_revenue[filtered_revenue['Customer'] == filters['selectedCustomers'][0]]
+                # Find the BU for this customer from the revenue data
+                customer_data = revenue_cube[revenue_quarter_mask(revenue_cube, quarter)
+                                             & (revenue_cube['Customer'] == filters['selectedCustomers'][0])]
                 if not customer_data.empty:
                     selected_bu = customer_data.iloc[0]['BU']
             
@@ -503,24 +686,10 @@ def download_roster_analysis():
 
         if summary_data:
             summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Get the worksheet to apply formatting
-            worksheet = writer.sheets['Summary']
-            
-            # Find the column indices for Customer GM and BU GM
-            cols = summary_df.columns.tolist()
-            customer_gm_col = cols.index('Customer GM') + 1 if 'Customer GM' in cols else None  # +1 for Excel 1-based indexing
-            bu_gm_col = cols.index('BU GM') + 1 if 'BU GM' in cols else None
-            
-            # Apply percentage formatting to the data rows (skip header row)
-            for row in range(2, len(summary_df) + 2):  # Start from row 2 (after header)
-                if customer_gm_col:
-                    worksheet.cell(row=row, column=customer_gm_col).number_format = '0.00%'
-                if bu_gm_col:
-                    worksheet.cell(row=row, column=bu_gm_col).number_format = '0.00%'
+            percent = workbook.add_format({'num_format': '0.00%'})
+            write_sheet(workbook, 'Summary', summary_df, {'Customer GM': percent, 'BU GM': percent})
         else:
-            pd.DataFrame([{'Message': 'No summary data available'}]).to_excel(writer, sheet_name='Summary', index=False)
+            write_sheet(workbook, 'Summary', pd.DataFrame([{'Message': 'No summary data available'}]))
 
 
         # Sheet 2: Changes Log
@@ -537,9 +706,9 @@ def download_roster_analysis():
                     'Cost Impact': entry.get('gmImpact', {}).get('costImpact', 0) if entry.get('gmImpact') else 0
                 })
             changes_df = pd.DataFrame(changes_data)
-            changes_df.to_excel(writer, sheet_name='DEBUG_changelog', index=False)
+            write_sheet(workbook, 'DEBUG_changelog', changes_df)
         else:
-            pd.DataFrame([{'Message': 'No changes recorded'}]).to_excel(writer, sheet_name='DEBUG_changelog', index=False)
+            write_sheet(workbook, 'DEBUG_changelog', pd.DataFrame([{'Message': 'No changes recorded'}]))
 
     
     output.seek(0)
@@ -549,67 +718,268 @@ def download_roster_analysis():
         output,
         as_attachment=True,
         download_name=f'roster-analysis-{timestamp}.xlsx',
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        mimetype=EXCEL_MIMETYPE
     )
 
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# The header style DataFrame.to_excel uses
+EXCEL_HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+def new_workbook(output):
+    """Open a workbook writing to the file output in constant-memory mode
+
+    Each row is flushed to a temporary file once the next row is started, so
+    sheets are written one at a time, top to bottom.
+    """
+    return xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_urls': False})
+
+def write_sheet(workbook, name, df, column_formats=None):
+    """Write df to a new sheet with a header row and no index, like DataFrame.to_excel
+
+    column_formats maps column names to formats applied to the whole column.
+    """
+    worksheet = workbook.add_worksheet(name)
+    header = workbook.add_format(EXCEL_HEADER_FORMAT)
+    column_formats = column_formats or {}
+    for col, column in enumerate(df.columns):
+        worksheet.write_string(0, col, str(column), header)
+        if column in column_formats:
+            worksheet.set_column(col, col, None, column_formats[column])
+
+    # tolist() turns numpy scalars into Python ones
+    for row, values in enumerate(zip(*(df[column].tolist() for column in df.columns)), start=1):
+        for col, value in enumerate(values):
+            write_cell(worksheet, row, col, value)
+    return worksheet
+
+def write_cell(worksheet, row, col, value):
+    """Write one value, leaving missing values blank and infinities as text as to_excel does"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NA or value is pd.NaT:
+        return
+    if isinstance(value, float):
+        if math.isnan(value):
+            return
+        if math.isinf(value):
+            worksheet.write_string(row, col, 'inf' if value > 0 else '-inf')
+            return
+    worksheet.write(row, col, value)
+
+FTE_COLUMNS = ['AllocationFTECapped_M1', 'AllocationFTECapped_M2', 'AllocationFTECapped_M3', 'AllocationFTECapped_QTR']
+
+# Filter key -> roster column it selects on
+ROSTER_FILTER_COLUMNS = {
+    'selectedBusinessUnits': 'FinalBU',
+    'selectedCustomers': 'PrismCustomerGroup',
+    'selectedLocations': 'Offshore_Onsite',
+}
+
+def roster_filter_mask(df, filters):
+    """Combine the frontend filters into one boolean mask over the roster
+
+    An empty or missing selection doesn't filter. Selecting only 'Y' or only
+    'N' billable status keeps billable or non-billable rows.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for key, column in ROSTER_FILTER_COLUMNS.items():
+        selected = filters.get(key)
+        if selected:
+            mask &= df[column].isin(selected).to_numpy()
+
+    selected_billable = filters.get('selectedBillableStatus', [])
+    if 'Y' in selected_billable and 'N' not in selected_billable:
+        mask &= (df['BillableYN'] == True).to_numpy()
+    elif 'N' in selected_billable and 'Y' not in selected_billable:
+        mask &= (df['BillableYN'] == False).to_numpy()
+    return mask
+
+def month_fte_column(df, month):
+    """The FTE column for a month such as 'M1', falling back to the quarter"""
+    month_col = f'AllocationFTECapped_{month}'
+    if month != 'Quarter' and month_col in df.columns:
+        return month_col
+    return 'AllocationFTECapped_QTR'
+
+def select_roster(df, filters, columns=None):
+    """Rows of df matching filters, and only columns if given, in a single copy"""
+    mask = roster_filter_mask(df, filters)
+    selected = df.loc[mask] if columns is None else df.loc[mask, columns]
+    # The selection already owns its data; a shallow copy only drops pandas'
+    # link back to df so callers can add columns without a warning
+    selected = selected.copy(deep=False)
+    selected.index = pd.RangeIndex(len(selected))
+    return selected
+
 def apply_filters_to_dataframe(df, filters):
     """Apply frontend filters to the dataframe"""
-    filtered_df = df.copy()
-    
-    # Apply month filter
-    month = filters.get('month', 'Quarter')
-    if month != 'Quarter':
-        # Set FTE column based on selected month
-        month_col = f'AllocationFTECapped_{month}'
-        if month_col in filtered_df.columns:
-            filtered_df['FTE'] = filtered_df[month_col]
-        else:
-            filtered_df['FTE'] = filtered_df.get('AllocationFTECapped_QTR', 0)
-    else:
-        filtered_df['FTE'] = filtered_df.get('AllocationFTECapped_QTR', 0)
-    
-    # Apply business unit filter
-    selected_bus = filters.get('selectedBusinessUnits', [])
-    if selected_bus:
-        filtered_df = filtered_df[filtered_df['FinalBU'].isin(selected_bus)]
-    
-    # Apply customer filter
-    selected_customers = filters.get('selectedCustomers', [])
-    if selected_customers:
-        filtered_df = filtered_df[filtered_df['PrismCustomerGroup'].isin(selected_customers)]
-    
-    # Apply location filter
-    selected_locations = filters.get('selectedLocations', [])
-    if selected_locations:
-        filtered_df = filtered_df[filtered_df['Offshore_Onsite'].isin(selected_locations)]
-    
-    # Apply billable status filter
-    selected_billable = filters.get('selectedBillableStatus', [])
-    if selected_billable:
-        # Convert boolean to Y/N for comparison
-        if 'Y' in selected_billable and 'N' not in selected_billable:
-            filtered_df = filtered_df[filtered_df['BillableYN'] == True]
-        elif 'N' in selected_billable and 'Y' not in selected_billable:
-            filtered_df = filtered_df[filtered_df['BillableYN'] == False]
-        # If both Y and N are selected, don't filter
-    
-    return filtered_df.reset_index(drop=True)
+    filtered_df = select_roster(df, filters)
+    filtered_df['FTE'] = filtered_df.get(month_fte_column(df, filters.get('month', 'Quarter')), 0)
+    return filtered_df
+
+def collapse_audit_log(audit_log):
+    """Reduce an audit log to its net effect on the roster
+
+    Returns the ids whose roster rows are removed, id -> the last FTE edit of
+    a roster row (as sent), and the added rows still present with their own
+    edits applied. An edit only reaches rows that exist at that point of the
+    log, as when the entries are replayed one by one.
+    """
+    removed_ids = set()
+    fte_by_id = {}
+    added_rows = []
+    # id -> positions in added_rows of rows that haven't been removed
+    added_by_id = {}
 
-def apply_audit_log_to_dataframe(df, audit_log):
-    # Convert to list of dicts for easier manipulation
-    result = df.to_dict('records')
-    
     for entry in audit_log:
-        if entry['action'] == 'EDIT_FTE':
-            for row in result:
-                if row['id'] == entry['employeeId']:
-                    row['FTE'] = float(entry['newValue'])
-        elif entry['action'] == 'REMOVE_EMPLOYEE':
-            result = [row for row in result if row['id'] != entry['employeeId']]
-        elif entry['action'] == 'ADD_EMPLOYEE' and 'employeeData' in entry:
-            result.append(entry['employeeData'])
-    
-    return pd.DataFrame(result)
+        action = entry['action']
+        if action == 'EDIT_FTE':
+            employee_id = entry['employeeId']
+            if employee_id not in removed_ids:
+                fte_by_id[employee_id] = entry['newValue']
+            for position in added_by_id.get(employee_id, ()):
+                added_rows[position] = dict(added_rows[position], FTE=float(entry['newValue']))
+        elif action == 'REMOVE_EMPLOYEE':
+            removed_ids.add(entry['employeeId'])
+            for position in added_by_id.pop(entry['employeeId'], ()):
+                added_rows[position] = None
+        elif action == 'ADD_EMPLOYEE' and 'employeeData' in entry:
+            row = entry['employeeData']
+            added_by_id.setdefault(row.get('id'), []).append(len(added_rows))
+            added_rows.append(row)
+
+    return removed_ids, fte_by_id, [row for row in added_rows if row is not None]
+
+def apply_audit_log_to_dataframe(df, audit_log):
+    """Replay the audit log's edits, removals and additions onto the roster
+
+    The log is collapsed first and then applied with one row selection, one
+    FTE update and one concat. See bench_audit_replay.py for the comparison
+    with replaying entry by entry over a list of dicts.
+    """
+    removed_ids, fte_by_id, added_rows = collapse_audit_log(audit_log)
+
+    keep = ~df['id'].isin(removed_ids).to_numpy() if 'id' in df.columns else np.zeros(len(df), dtype=bool)
+    if not keep.any():
+        # The columns then come from the added rows alone
+        return pd.DataFrame(added_rows)
+
+    result = df.loc[keep].copy(deep=False)
+    edited = result['id'].isin(list(fte_by_id)).to_numpy()
+    if edited.any():
+        fte = result['FTE'].astype(float) if 'FTE' in result.columns else pd.Series(np.nan, index=result.index)
+        fte[edited] = result.loc[edited, 'id'].map(fte_by_id).astype(float)
+        result['FTE'] = fte
+
+    if added_rows:
+        return pd.concat([result, pd.DataFrame(added_rows)], ignore_index=True)
+    return result.reset_index(drop=True)
+
+def json_values(df):
+    """df as Python objects with NaN and infinite values replaced by None"""
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df.astype(object).where(df.notna(), None)
+
+def encode_json(value):
+    """Compact JSON with floats in their shortest exact form, as jsonify writes them"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+
+def frame_to_json(df):
+    """Encode a frame as a JSON array of records
+
+    NaN and infinite values become null.
+    """
+    return encode_json(json_values(df).to_dict('records')).encode()
+
+def frame_to_compact_json(df):
+    """Encode a frame column by column, dictionary-encoding repeated strings
+
+    The result is {"length": rows, "columns": [...]} where each column is
+    either {"name", "values"} or {"name", "dictionary", "codes"}. Missing
+    values are null, or code -1.
+    """
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if column.dtype == object or isinstance(column.dtype, pd.CategoricalDtype):
+            codes, dictionary = pd.factorize(column)
+            # Unique columns such as 'id' are smaller without a dictionary
+            if len(dictionary) <= len(column) / 2:
+                dictionary_json = pd.Series(dictionary, dtype=object).to_json(orient='values', force_ascii=False)
+                columns.append(f'{{"name":{json.dumps(name)},"dictionary":{dictionary_json},"codes":{json.dumps(codes.tolist())}}}')
+                continue
+        values_json = encode_json(json_values(column).tolist())
+        columns.append(f'{{"name":{json.dumps(name)},"values":{values_json}}}')
+    return f'{{"length":{len(df)},"columns":[{",".join(columns)}]}}'.encode()
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+def accepted_encoding():
+    """The best content encoding the client accepts, or None"""
+    if brotli is not None and 'br' in request.accept_encodings:
+        return 'br'
+    if 'gzip' in request.accept_encodings:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def bu_key(user_bus):
+    """A hashable form of get_user_bus() for response cache keys"""
+    return None if user_bus is None else frozenset(user_bus)
+
+def cached_frame_response(name, sources, build_frame, *params):
+    """Respond with build_frame() as JSON, reusing the encoded bytes while the sources are unchanged
+
+    params identify the variant, e.g. the user's BUs and query arguments. The
+    sources are read first so expired data is still refreshed, and the bytes
+    are only cached if no source changed while the frame was built.
+
+    build_frame() may also return (frame, metadata), which is sent as the
+    metadata object with the encoded frame under 'results'.
+
+    ?format=compact selects frame_to_compact_json. Bodies are compressed when
+    the client accepts it and carry a strong ETag of their content, so
+    revalidating an unchanged response returns 304 Not Modified.
+    """
+    generation = tuple(source.get_entry()[1] for source in sources)
+    compact = request.args.get('format') == 'compact'
+    encoding = accepted_encoding()
+    key = (name, generation, compact, encoding, *params)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        frame, metadata = build_frame(), None
+        if isinstance(frame, tuple):
+            frame, metadata = frame
+        body = frame_to_compact_json(frame) if compact else frame_to_json(frame)
+        if metadata is not None:
+            body = json.dumps(metadata).encode()[:-1] + b',"results":' + body + b'}'
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if encoding is not None and len(body) >= COMPRESS_MIN_BYTES:
+            body = compress(body, encoding)
+            # Each encoding is a different representation with its own ETag
+            etag = f'{etag}-{encoding}'
+        else:
+            encoding = None
+        entry = (etag, body, encoding)
+        if generation == tuple(source.generation for source in sources):
+            response_cache.put(key, entry)
+
+    etag, body, encoding = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response.make_conditional(request)
 
 @app.route('/')
 def home():
@@ -620,38 +990,110 @@ def home():
 @app.route('/api/total-employees')
 def get_total_employees():
     """Get all possible employees (the pool)"""
-    user_bus = get_user_bus()
-    _,_,df = load_employees(user_bus)
-    return jsonify(df.to_dict(orient='records'))
+    # The pool is the same for every user
+    return cached_frame_response('total_employees', [rac_cache], lambda: load_employees()[2])
 
-@app.route('/api/gm-details')
-def get_gm_details():
-    """Get GM details for the portfolio of the user"""
-    # Download from Azure Blob Storage
-    account_url = "https://sonataonefpa.blob.core.windows.net/"
-    container_name = "testpoccontainer"
-    credential = get_credential()
-    blob_service_client = BlobServiceClient(account_url, credential=credential)
-    container_client = blob_service_client.get_container_client(container_name)
-
-    revenue = get_cached_prism_data()
-
-    # Download plan.csv
-    plan_blob_client = container_client.get_blob_client("plan.csv")
-    plan_download_stream = plan_blob_client.download_blob()
-    plan_content = io.BytesIO(plan_download_stream.readall())
-    plan = pd.read_csv(plan_content, low_memory=False)
-
-    # Download odc.csv
-    odc_blob_client = container_client.get_blob_client("odc.csv")
-    odc_download_stream = odc_blob_client.download_blob()
-    odc_content = io.BytesIO(odc_download_stream.readall())
-    odc = pd.read_csv(odc_content, low_memory=False)
-    cost = get_cached_data()
-
-
-    quarter_formatted = max_quarter[:2]
-    filtered_revenue = revenue[revenue['Quarter'] == quarter_formatted].reset_index(drop=True)
+def get_employee_search_index():
+    return get_derived_data('employee_search', lambda df: EmployeeSearchIndex(get_roster()[1]))
+
+SEARCH_LIMIT_MAX = 200
+
+@app.route('/api/employees/search')
+def search_employees():
+    """Search the employee pool within the user's BUs, best matches first"""
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), SEARCH_LIMIT_MAX)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    results, total = get_employee_search_index().search(query, get_user_bus(), limit)
+    body = f'{{"query":{json.dumps(query)},"total":{total},"results":{frame_to_json(results).decode()}}}'
+    return app.response_class(body, mimetype='application/json')
+
+REVENUE_MONTHS = ['M1', 'M2', 'M3']
+REVENUE_CUBE_KEYS = ['Quarter', 'FinancialYear', 'BU', 'Customer']
+ALLOCATION_COST_COLUMNS = ['AllocationCost_M1', 'AllocationCost_M2', 'AllocationCost_M3', 'AllocationCost_QTR']
+
+# Quarters without prism revenue, already logged
+_unmatched_revenue_quarters = set()
+
+def revenue_quarter_mask(revenue, quarter):
+    """Rows of prism revenue, or of the revenue cube, in a quarter such as Q1FY2026
+
+    Rows are matched on Quarter and, when the column exists, FinancialYear.
+    A quarter without rows is logged once, with the years its quarter has.
+    """
+    quarter_mask = revenue['Quarter'] == quarter[:2]
+    mask = quarter_mask
+    if 'FinancialYear' in revenue.columns:
+        mask = quarter_mask & (revenue['FinancialYear'] == quarter[2:])
+
+    if not revenue.empty and not mask.any() and quarter not in _unmatched_revenue_quarters:
+        _unmatched_revenue_quarters.add(quarter)
+        years = revenue.loc[quarter_mask, 'FinancialYear'] if 'FinancialYear' in revenue.columns else pd.Series(dtype=object)
+        found = ', '.join(sorted(years.astype(str).unique())) or 'none'
+        app.logger.warning(f"No prism revenue for {quarter}, its {quarter[:2]} rows are of years: {found}")
+    return mask
+
+def build_revenue_cube(revenue):
+    """Sum Total_Revenue by quarter, year, BU and customer for the quarter (QTR) and each of M1-M3
+
+    A month's revenue is that of the rows whose Month contains its name. Groups
+    keep the order in which they first appear in the revenue data.
+    """
+    if revenue.empty:
+        return pd.DataFrame(columns=REVENUE_CUBE_KEYS + ['QTR'] + REVENUE_MONTHS)
+
+    keys = [key for key in REVENUE_CUBE_KEYS if key in revenue.columns or key == 'Customer']
+    cube = revenue.rename(columns={'Title': 'Customer'})[keys]
+    cube = cube.assign(QTR=revenue['Total_Revenue'])
+    for month in REVENUE_MONTHS:
+        cube[month] = revenue['Total_Revenue'].where(revenue['Month'].str.contains(month, na=False), 0)
+    return cube.groupby(keys, sort=False, dropna=False).sum().reset_index()
+
+def get_revenue_cube():
+    return derived_data.get('revenue_cube', build_revenue_cube, prism_cache)
+
+def revenue_total(cube, quarter, month, column=None, values=None):
+    """Revenue of a quarter such as Q1FY2026 for month 'Quarter' or one of M1-M3, in currency units
+
+    With values only the rows whose column is one of them are counted. Any
+    other month, or a quarter without revenue, gives 0.
+    """
+    rows = cube[revenue_quarter_mask(cube, quarter)]
+    if rows.empty or (month != 'Quarter' and month not in REVENUE_MONTHS):
+        return 0
+    if values:
+        rows = rows[rows[column].isin(values)]
+    return rows['QTR' if month == 'Quarter' else month].sum() * 1000000
+
+def build_allocation_cube(cost):
+    """Sum the allocation cost by BU and customer for each month and the quarter"""
+    if cost.empty:
+        return pd.DataFrame(columns=ALLOCATION_COST_COLUMNS)
+    return cost.groupby(['FinalBU', 'PrismCustomerGroup'], observed=True)[ALLOCATION_COST_COLUMNS].sum()
+
+def get_allocation_cube(quarter=max_quarter):
+    return get_derived_data('allocation_cube', build_allocation_cube, quarter)
+
+def allocation_cost(cube, month, bu, customer=None):
+    """Allocation cost of a BU, or of one of its customers, for M1-M3 or else the quarter"""
+    column = f'AllocationCost_{month}' if month in REVENUE_MONTHS else 'AllocationCost_QTR'
+    try:
+        if customer is None:
+            return np.float64(cube.loc[bu, column].sum())
+        return np.float64(cube.loc[(bu, customer), column])
+    except KeyError:
+        return np.float64(0)
+
+def build_gm_details(revenue, plan, odc, allocation_cube, quarter=max_quarter):
+    """Merge revenue, plan GM, allocation cost and ODC for every BU and customer
+
+    Returns the merged frame and its partitions by revenue BU.
+    """
+    quarter_formatted = quarter[:2]
+    filtered_revenue = revenue[revenue_quarter_mask(revenue, quarter)].reset_index(drop=True)
     filtered_plan = plan[plan['Quarter'] == quarter_formatted].reset_index(drop=True)
     filtered_plan.drop(columns=['Customer'], inplace=True)
     filtered_plan.rename(columns={'Prism': 'Customer', 'BU': 'Plan BU'}, inplace=True)
@@ -661,27 +1103,9 @@ def get_gm_details():
     grouped_filtered_plan.drop(columns=['PlanCost', 'Quarter', 'RAC'], inplace=True)
     filtered_revenue.rename(columns={'Title': 'Customer'}, inplace=True)
     merged_with_plan_gm = pd.merge(filtered_revenue, grouped_filtered_plan, on='Customer', how='left')
-    user_bus = get_user_bus()
-
-    if user_bus is None:
-        # User has 'All' access - no filtering
-        filtered_plan_gm = merged_with_plan_gm.copy()
-    elif len(user_bus) == 0:
-        # User not in permissions - show no data
-        filtered_plan_gm = pd.DataFrame(columns=merged_with_plan_gm.columns)
-    else:
-        # User has specific BU access
-        filtered_plan_gm = merged_with_plan_gm[merged_with_plan_gm['BU'].isin(user_bus)].reset_index(drop=True)
-
-    filtered_plan_gm.drop(columns=['FinancialYear'], inplace=True)
+    merged_with_plan_gm.drop(columns=['FinancialYear'], inplace=True, errors='ignore')
 
-    grouped_gm = cost.groupby(['FinalBU', 'PrismCustomerGroup'])[
-        [
-            'AllocationCost_M1',
-            'AllocationCost_M2',
-            'AllocationCost_M3',
-        ]
-    ].sum().reset_index()
+    grouped_gm = allocation_cube[['AllocationCost_M1', 'AllocationCost_M2', 'AllocationCost_M3']].reset_index()
 
     melted_gm = grouped_gm.melt(
         id_vars=['FinalBU', 'PrismCustomerGroup'],
@@ -691,13 +1115,13 @@ def get_gm_details():
     )
     # Convert 'Month' from 'AllocationCost_M1' to 'M1', etc.
     melted_gm['Month'] = melted_gm['Month'].str.extract(r'AllocationCost_(M\d)')
-    month_map = get_quarter_months(max_quarter)
+    month_map = get_quarter_months(quarter)
     melted_gm['MonthName'] = melted_gm['Month'].map(month_map)
     melted_gm['Month'] = melted_gm['MonthName'].str.split(' ').str[0]
     melted_gm.drop(columns=['MonthName'], inplace=True)
     melted_gm.rename(columns={'PrismCustomerGroup': 'Customer', 'FinalBU': 'BU'}, inplace=True)
     with_allocation_cost = pd.merge(
-        filtered_plan_gm, melted_gm, on=['BU', 'Customer', 'Month'], how='left'
+        merged_with_plan_gm, melted_gm, on=['BU', 'Customer', 'Month'], how='left'
     )
     with_odc = pd.merge(
         with_allocation_cost, odc, on='BU', how='left'
@@ -707,7 +1131,166 @@ def get_gm_details():
     with_odc = with_odc.fillna(0)
     with_odc = with_odc.replace([float('inf'), float('-inf')], 0)
 
-    return jsonify(with_odc.to_dict(orient='records'))
+    return with_odc, partition_by_bu(with_odc, 'BU')
+
+def get_gm_details_data(quarter=max_quarter):
+    return derived_data.get(
+        f'gm_details:{quarter}',
+        lambda revenue, plan, odc, cost: build_gm_details(revenue, plan, odc, get_allocation_cube(quarter), quarter),
+        prism_cache, plan_cache, odc_cache, cost_cache(quarter)
+    )
+
+@app.route('/api/gm-details')
+def get_gm_details():
+    """Get GM details for the portfolio of the user"""
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
+    user_bus = get_user_bus()
+
+    def build_user_gm_details():
+        gm_details, partitions = get_gm_details_data(quarter)
+        return select_bu_partitions(gm_details, partitions, user_bus)
+
+    return cached_frame_response(
+        f'gm_details:{quarter}', [prism_cache, plan_cache, odc_cache, cost_cache(quarter)],
+        build_user_gm_details, bu_key(user_bus)
+    )
+
+CPC_PERIODS = ['M1', 'M2', 'M3', 'QTR']
+
+def build_cpc_index(df):
+    """Build the CPC lookup tables used to price audit log entries
+
+    Returns employee code -> CPC per period, band/location -> average quarterly
+    CPC and the overall fallback CPC used for unknown band/location pairs.
+    """
+    grouped_df = df[ROSTER_COLUMNS].groupby(ROSTER_GROUPING_COLUMNS, observed=True).sum().reset_index()
+
+    for period in CPC_PERIODS:
+        cpc = grouped_df[f'TotalCost_{period}'] / grouped_df[f'TotalFTECapped_{period}'].replace(0, 1)
+        grouped_df[f'CPC_{period}'] = cpc / 3 if period == 'QTR' else cpc
+
+    grouped_df = grouped_df.replace([float('inf'), float('-inf')], 0)
+    grouped_df['EmployeeCode'] = grouped_df['EmployeeCode'].astype(int).astype(str)
+
+    # An employee can appear under several customers; the last group wins for
+    # the direct lookup and the first one for codes that only match as integers
+    last_rows = grouped_df.drop_duplicates('EmployeeCode', keep='last')
+    first_rows = grouped_df.drop_duplicates('EmployeeCode', keep='first')
+    employee_cpc = {
+        period: dict(zip(last_rows['EmployeeCode'], last_rows[f'CPC_{period}']))
+        for period in CPC_PERIODS
+    }
+    employee_first_cpc = dict(zip(first_rows['EmployeeCode'], first_rows['CPC_QTR']))
+
+    band_location_groups = grouped_df.groupby(['Band', 'Offshore_Onsite'], observed=True)[
+        ['TotalCost_QTR', 'TotalFTECapped_QTR']
+    ].sum().reset_index()
+    total_fte = band_location_groups['TotalFTECapped_QTR']
+    avg_cpc = (band_location_groups['TotalCost_QTR'] / total_fte.where(total_fte > 0) / 3).fillna(0)
+    keys = band_location_groups['Band'].astype(str) + '_' + band_location_groups['Offshore_Onsite'].astype(str)
+    band_location_cpc = dict(zip(keys, avg_cpc))
+
+    fallback_cpc = None
+    if band_location_cpc:
+        fallback_cpc = sum(band_location_cpc.values()) / len(band_location_cpc)
+
+    return {
+        'employee': employee_cpc,
+        'employee_first': employee_first_cpc,
+        'band_location': band_location_cpc,
+        'fallback': fallback_cpc,
+    }
+
+def get_cpc_index():
+    return get_derived_data('cpc_index', build_cpc_index)
+
+def _integer_employee_code(employee_code):
+    try:
+        return str(int(employee_code))
+    except ValueError:
+        return None
+
+def calculate_gm_impacts(entries, period, cpc_index):
+    """Calculate the gmImpact objects for a list of audit entries in one pass
+
+    New hires are priced with their custom cost, then the band/location average,
+    then the overall fallback; existing employees with their own quarterly CPC.
+    An entry's own 'period' overrides the request period.
+    """
+    gm_data = [entry.get('gmData', {}) for entry in entries]
+    periods = pd.Series([entry.get('period', period) for entry in entries], dtype=object)
+
+    is_new_hire = pd.Series([bool(d.get('isNewHire', False)) for d in gm_data], dtype=bool)
+    custom_costs = [d.get('customCost') for d in gm_data]
+    has_custom_cost = pd.Series([c is not None and c > 0 for c in custom_costs], dtype=bool)
+    custom_cpc = pd.Series([float(c) if has else 0.0 for c, has in zip(custom_costs, has_custom_cost)])
+    band_keys = pd.Series([f"{d.get('band', '')}_{d.get('location', '')}" for d in gm_data], dtype=object)
+    employee_codes = pd.Series([str(d.get('employeeCode', '')) for d in gm_data], dtype=object)
+    integer_codes = employee_codes.map(_integer_employee_code)
+    fte_changes = [d.get('fteChange', 0) for d in gm_data]
+
+    # CPCs are always finite, so a NaN after mapping means the key is missing
+    employee_cpc = employee_codes.map(cpc_index['employee']['QTR'])
+    band_location_cpc = band_keys.map(cpc_index['band_location'])
+    first_cpc = integer_codes.map(cpc_index['employee_first'])
+    has_fallback = cpc_index['fallback'] is not None
+    fallback_cpc = cpc_index['fallback'] if has_fallback else 0
+
+    conditions = [
+        is_new_hire & has_custom_cost,
+        is_new_hire & band_location_cpc.notna(),
+        is_new_hire & has_fallback,
+        is_new_hire,
+        employee_cpc.notna(),
+        integer_codes.isna(),
+        first_cpc.notna(),
+    ]
+    cpc_used = np.select(conditions, [
+        custom_cpc,
+        band_location_cpc,
+        fallback_cpc,
+        0,
+        employee_cpc,
+        0,
+        first_cpc,
+    ], default=0).astype(float)
+    lookup_methods = np.select(conditions, [
+        'custom_cost (' + pd.Series([str(c) for c in custom_costs], dtype=object) + ')',
+        'band_location_avg (' + band_keys + ')',
+        'fallback_avg',
+        '',
+        'employee_specific (' + employee_codes + ')',
+        'conversion_error',
+        'direct_lookup (' + employee_codes + ')',
+    ], default='not_found')
+
+    multipliers = np.where(periods == 'Quarter', 3, 1)
+    cost_impacts = np.asarray(fte_changes, dtype=float) * cpc_used * multipliers
+
+    return [
+        {
+            'cpcUsed': round(float(cpc), 2),
+            'fteChange': round(fte_change, 2),
+            'costImpact': round(float(cost_impact), 2),
+            'calculationMethod': str(method)
+        }
+        for cpc, fte_change, cost_impact, method in zip(cpc_used, fte_changes, cost_impacts, lookup_methods)
+    ]
+
+def get_gm_impact_index():
+    """Return the CPC index, or an error response if the cost data can't be priced"""
+    df = get_cached_data()
+
+    if df.empty:
+        return None, (jsonify({'error': 'No data available in CSV file'}), 500)
+
+    missing_cols = [col for col in ROSTER_COLUMNS if col not in df.columns]
+    if missing_cols:
+        return None, (jsonify({'error': f'Missing required columns: {missing_cols}'}), 500)
+
+    return get_cpc_index(), None
 
 @app.route('/api/gm-impact', methods=['POST'])
 def calculate_gm_impact():
@@ -718,143 +1301,14 @@ def calculate_gm_impact():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        df = get_cached_data()
-        
-        if df.empty:
-            return jsonify({'error': 'No data available in CSV file'}), 500
-        
-        employee_cpc_lookup = {}
-        band_location_cpc_lookup = {}
-        
-        relevant_columns = [
-            'EmployeeCode', 'EmployeeName', 'Band', 'Offshore_Onsite', 
-            'FinalBU', 'FinalCustomer', 'PrismCustomerGroup',
-            'ProjectRole', 'Sub-Practice', 'Practice', 'BillableYN',
-            'AllocationFTECapped_M1', 'AllocationFTECapped_M2', 'AllocationFTECapped_M3', 'AllocationFTECapped_QTR',
-            'TotalFTECapped_M1', 'TotalFTECapped_M2', 'TotalFTECapped_M3', 'TotalFTECapped_QTR',
-            'TotalCost_M1', 'TotalCost_M2', 'TotalCost_M3', 'TotalCost_QTR'
-        ]
-        
-        missing_cols = [col for col in relevant_columns if col not in df.columns]
-        if missing_cols:
-            return jsonify({'error': f'Missing required columns: {missing_cols}'}), 500
-        
-        df_subset = df[relevant_columns].copy()
-        
-        grouping_columns = ['EmployeeCode', 'EmployeeName', 'Band', 'Offshore_Onsite', 
-                           'FinalBU', 'FinalCustomer', 'PrismCustomerGroup', 
-                           'ProjectRole', 'Sub-Practice', 'Practice', 'BillableYN']
-        
-        grouped_df = df_subset.groupby(grouping_columns).agg({
-            'AllocationFTECapped_M1': 'sum',
-            'AllocationFTECapped_M2': 'sum', 
-            'AllocationFTECapped_M3': 'sum',
-            'AllocationFTECapped_QTR': 'sum',
-            'TotalFTECapped_M1': 'sum',
-            'TotalFTECapped_M2': 'sum',
-            'TotalFTECapped_M3': 'sum', 
-            'TotalFTECapped_QTR': 'sum',
-            'TotalCost_M1': 'sum',
-            'TotalCost_M2': 'sum',
-            'TotalCost_M3': 'sum',
-            'TotalCost_QTR': 'sum'
-        }).reset_index()
-        
-        grouped_df['CPC_M1'] = grouped_df['TotalCost_M1'] / grouped_df['TotalFTECapped_M1'].replace(0, 1)
-        grouped_df['CPC_M2'] = grouped_df['TotalCost_M2'] / grouped_df['TotalFTECapped_M2'].replace(0, 1)
-        grouped_df['CPC_M3'] = grouped_df['TotalCost_M3'] / grouped_df['TotalFTECapped_M3'].replace(0, 1)
-        grouped_df['CPC_QTR'] = grouped_df['TotalCost_QTR'] / grouped_df['TotalFTECapped_QTR'].replace(0, 1) / 3
-        
-        grouped_df = grouped_df.replace([float('inf'), float('-inf')], 0)
-        
-        for _, row in grouped_df.iterrows():
-            employee_code = str(int(row['EmployeeCode']))  # Convert to string for consistency
-            cpc_qtr = row['CPC_QTR']
-            employee_cpc_lookup[employee_code] = cpc_qtr
-        
-        band_location_groups = grouped_df.groupby(['Band', 'Offshore_Onsite']).agg({
-            'TotalCost_QTR': 'sum',
-            'TotalFTECapped_QTR': 'sum'
-        }).reset_index()
-        
-        for _, row in band_location_groups.iterrows():
-            band = row['Band']
-            location = row['Offshore_Onsite']
-            total_cost = row['TotalCost_QTR']
-            total_fte = row['TotalFTECapped_QTR']
-            
-            avg_cpc = (total_cost / total_fte / 3) if total_fte > 0 else 0
-            key = f"{band}_{location}"
-            band_location_cpc_lookup[key] = avg_cpc
+        cpc_index, error_response = get_gm_impact_index()
+        if error_response:
+            return error_response
         
         entry = None  # Ensure entry is always defined
         if 'latestEntry' in data:
             entry = data['latestEntry']
-            gmData = entry.get('gmData', {})
-            
-            # Calculate GM impact
-            cpc_used = 0
-            lookup_method = ""
-
-            if gmData.get('isNewHire', False):
-                # Check if custom cost is provided
-                custom_cost = gmData.get('customCost')
-                
-                if custom_cost is not None and custom_cost > 0:
-                    # Use the provided custom cost as CPC
-                    cpc_used = float(custom_cost)
-                    lookup_method = f"custom_cost ({custom_cost})"
-                else:
-                    # Use band + location average CPC (existing logic)
-                    band = gmData.get('band', '')
-                    location = gmData.get('location', '')
-                    lookup_key = f"{band}_{location}"
-                    
-                    if lookup_key in band_location_cpc_lookup:
-                        cpc_used = band_location_cpc_lookup[lookup_key]
-                        lookup_method = f"band_location_avg ({lookup_key})"
-                    else:
-                        # Use overall average as fallback
-                        if band_location_cpc_lookup:
-                            cpc_used = sum(band_location_cpc_lookup.values()) / len(band_location_cpc_lookup)
-                            lookup_method = "fallback_avg"
-                    
-            else:
-                # For existing employees, use individual CPC
-                employee_code = str(gmData.get('employeeCode', ''))
-                
-                if employee_code in employee_cpc_lookup:
-                    cpc_used = employee_cpc_lookup[employee_code]
-                    lookup_method = f"employee_specific ({employee_code})"
-                else:
-                    try:
-                        employee_code_int = int(employee_code)
-                        matching_rows = grouped_df.loc[grouped_df['EmployeeCode'] == employee_code_int]
-                        if not matching_rows.empty:
-                            cpc_used = matching_rows.iloc[0]['CPC_QTR']
-                            lookup_method = f"direct_lookup ({employee_code})"
-                        else:
-                            cpc_used = 0
-                            lookup_method = "not_found"
-                    except ValueError:
-                        cpc_used = 0
-                        lookup_method = "conversion_error"
-            
-            # Calculate the GM impact
-            fte_change = gmData.get('fteChange', 0)
-            gm_impact = fte_change * cpc_used
-            period = data.get('period')
-            print(period)
-            if period == 'Quarter':
-                gm_impact = gm_impact * 3
-            
-            # Add GM impact to the entry
-            entry['gmImpact'] = {
-                'cpcUsed': round(cpc_used, 2),
-                'fteChange': round(fte_change, 2),
-                'costImpact': round(gm_impact, 2),
-                'calculationMethod': lookup_method
-            }
+            entry['gmImpact'] = calculate_gm_impacts([entry], data.get('period'), cpc_index)[0]
         
         # Update the audit log with GM impact data
         updated_audit_log = data.get('auditLog', [])
@@ -870,8 +1324,8 @@ def calculate_gm_impact():
             'auditLog': updated_audit_log,
             'message': 'GM impact calculation completed',
             'debug': {
-                'employee_cpc_count': len(employee_cpc_lookup),
-                'band_location_cpc_count': len(band_location_cpc_lookup)
+                'employee_cpc_count': len(cpc_index['employee']['QTR']),
+                'band_location_cpc_count': len(cpc_index['band_location'])
             }
         })
         
@@ -880,32 +1334,305 @@ def calculate_gm_impact():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/gm-impact/batch', methods=['POST'])
+def calculate_gm_impact_batch():
+    """Calculate GM impact for many audit log entries in a single request"""
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get('entries'), list):
+            return jsonify({'error': 'No entries provided'}), 400
+
+        cpc_index, error_response = get_gm_impact_index()
+        if error_response:
+            return error_response
+
+        entries = data['entries']
+        gm_impacts = calculate_gm_impacts(entries, data.get('period'), cpc_index)
+
+        return jsonify({
+            'success': True,
+            'results': [
+                {'id': entry.get('id'), 'gmImpact': gm_impact}
+                for entry, gm_impact in zip(entries, gm_impacts)
+            ],
+            'totalCostImpact': round(sum(gm_impact['costImpact'] for gm_impact in gm_impacts), 2),
+            'message': f'GM impact calculated for {len(gm_impacts)} entries'
+        })
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+scenario_store = open_scenario_store()
+
+def gm_baseline(revenue_cube, allocation_cube, odc_rates, quarter, month, bu=None, customer=None):
+    """(revenue, allocation cost, ODC) of a BU or, with customer, of a customer across its BUs
+
+    month is 'Quarter' or one of M1-M3; ODC is a share of revenue set per BU.
+    """
+    rows = revenue_cube[revenue_quarter_mask(revenue_cube, quarter)]
+    rows = rows[rows['Customer'] == customer] if customer is not None else rows[rows['BU'] == bu]
+    revenue = rows[month if month in REVENUE_MONTHS else 'QTR'] * 1000000
+    odc = (revenue * rows['BU'].map(odc_rates).fillna(0)).sum()
+
+    if customer is None:
+        cost = allocation_cost(allocation_cube, month, bu)
+    elif customer in allocation_cube.index.get_level_values('PrismCustomerGroup'):
+        column = f'AllocationCost_{month}' if month in REVENUE_MONTHS else 'AllocationCost_QTR'
+        cost = allocation_cube.xs(customer, level='PrismCustomerGroup')[column].sum()
+    else:
+        cost = 0
+    return float(revenue.sum()), float(cost), float(odc)
+
+def add_scenario_gm(scenario, quarter):
+    """Add the GM of every customer and BU in a scenario's totals, before and after its cost impact
+
+    Only the keys in the running totals are priced, so this doesn't depend on
+    the length of the scenario's log.
+    """
+    month = scenario['period'] if scenario['period'] in REVENUE_MONTHS else 'Quarter'
+    totals = scenario['totals']
+    gm = {'quarter': quarter, 'month': month, 'byCustomer': {}, 'byBU': {}}
+    if totals['byCustomer'] or totals['byBU']:
+        revenue_cube = get_revenue_cube()
+        allocation_cube = get_allocation_cube(quarter)
+        odc = odc_cache.get()
+        odc_rates = odc.drop_duplicates('BU').set_index('BU')['ODC']
+
+        for dimension, arguments in (('byCustomer', 'customer'), ('byBU', 'bu')):
+            for key, cost_impact in totals[dimension].items():
+                revenue, cost, odc_cost = gm_baseline(
+                    revenue_cube, allocation_cube, odc_rates, quarter, month, **{arguments: key}
+                )
+                base_gm = revenue - cost - odc_cost
+                scenario_gm = base_gm - cost_impact
+                gm[dimension][key] = {
+                    'revenue': round(revenue, 2),
+                    'cost': round(cost + odc_cost, 2),
+                    'costImpact': cost_impact,
+                    'baseGM': round(base_gm, 2),
+                    'gm': round(scenario_gm, 2),
+                    'baseGM%': base_gm / revenue if revenue else None,
+                    'gm%': scenario_gm / revenue if revenue else None,
+                }
+    scenario['gm'] = gm
+    return scenario
+
+@app.route('/api/scenarios', methods=['GET'])
+def list_scenarios():
+    """List the current user's scenarios with their totals and GM for ?quarter="""
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
+    return jsonify([add_scenario_gm(s, quarter) for s in scenario_store.list(get_current_user()['email'])])
+
+@app.route('/api/scenarios', methods=['POST'])
+def create_scenario():
+    """Create an empty scenario, optionally with a name and the period its entries are priced for"""
+    data = request.get_json(silent=True) or {}
+    scenario = scenario_store.create(get_current_user()['email'], str(data.get('name', '')), data.get('period'))
+    return jsonify(add_scenario_gm(scenario, max_quarter)), 201
+
+@app.route('/api/scenarios/<scenario_id>', methods=['GET'])
+def get_scenario(scenario_id):
+    """Totals and GM of a scenario for ?quarter=, add ?entries=1 for its audit log"""
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
+    owner = get_current_user()['email']
+    scenario = scenario_store.get(scenario_id, owner)
+    if scenario is None:
+        return jsonify({'error': 'Scenario not found'}), 404
+    if request.args.get('entries'):
+        scenario['entries'] = scenario_store.entries(scenario_id, owner)
+    return jsonify(add_scenario_gm(scenario, quarter))
+
+@app.route('/api/scenarios/<scenario_id>', methods=['DELETE'])
+def delete_scenario(scenario_id):
+    if not scenario_store.delete(scenario_id, get_current_user()['email']):
+        return jsonify({'error': 'Scenario not found'}), 404
+    return '', 204
+
+@app.route('/api/scenarios/<scenario_id>/entries', methods=['POST'])
+def append_scenario_entry(scenario_id):
+    """Price one audit entry and add it to the scenario
+
+    Only the new entry is sent; the response has it with its gmImpact and the
+    scenario's updated totals and GM for ?quarter=.
+    """
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
+    owner = get_current_user()['email']
+    data = request.get_json(silent=True) or {}
+    entry = data.get('entry')
+    if not isinstance(entry, dict) or entry.get('action') not in SCENARIO_ACTIONS:
+        return jsonify({'error': f'entry must be an object with an action of {", ".join(SCENARIO_ACTIONS)}'}), 400
+
+    scenario = scenario_store.get(scenario_id, owner)
+    if scenario is None:
+        return jsonify({'error': 'Scenario not found'}), 404
+
+    cpc_index, error_response = get_gm_impact_index()
+    if error_response:
+        return error_response
+
+    entry['gmImpact'] = calculate_gm_impacts([entry], data.get('period', scenario['period']), cpc_index)[0]
+    scenario = scenario_store.append(scenario_id, owner, entry)
+    if scenario is None:
+        return jsonify({'error': 'Scenario not found'}), 404
+    return jsonify({'entry': entry, 'scenario': add_scenario_gm(scenario, quarter)})
+
 @app.route('/api/employees', methods=['GET'])
 def get_employees():
-    """Get all employees data"""
+    """Get all employees data
+
+    Without paging arguments the whole roster is returned as a list, see
+    parse_page_args for the paged form.
+    """
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
     user_bus = get_user_bus()
-    _,df,_ = load_employees(user_bus)
-    month = request.args.get('month')
-    location = request.args.get('location')
-
-    fte_cols = ['AllocationFTECapped_M1', 'AllocationFTECapped_M2', 'AllocationFTECapped_M3',  'AllocationFTECapped_QTR'] 
-    if month == None or month == 'Quarter': # the page just loaded, and it defaults to quarter FTE
-        fte_cols_without_month = [col for col in fte_cols if col != 'AllocationFTECapped_QTR']
-        df_reduced = df.drop(columns=fte_cols_without_month)
-        df_reduced.rename(columns={'AllocationFTECapped_QTR': 'FTE'}, inplace=True)
-        df_reduced['FTE'] = df_reduced['FTE'].round(2)
-    else:
-        month_col = f'AllocationFTECapped_{month}'
-        df_reduced = df.drop(columns=[col for col in fte_cols if col != month_col])
-        df_reduced.rename(columns={month_col: 'FTE'}, inplace=True)
-        df_reduced['FTE'] = df_reduced['FTE'].round(2)
-    
-    if location == None or location == 'All':
-        pass
-    else:
-        df_reduced = df_reduced[df_reduced['Offshore_Onsite'] == location].reset_index(drop=True)
+    filters = filters_from_args(request.args)
+
+    try:
+        page = parse_page_args(request.args, get_employees_view_columns(quarter))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build_employees():
+        df = build_employees_view(user_bus, filters, quarter)
+        return df if page is None else paginate(df, page)
 
-    return jsonify(df_reduced.to_dict(orient='records'))
+    return cached_frame_response(
+        f'employees:{quarter}', [cost_cache(quarter)], build_employees,
+        bu_key(user_bus), tuple(sorted(filters.items())), tuple(sorted((page or {}).items()))
+    )
+
+def filters_from_args(args):
+    """Read the roster filters sent by filters.js
+
+    businessUnits, customers, locations and billableStatus may be repeated.
+    The older single location argument ('All' for every location) is still
+    accepted.
+    """
+    filters = {
+        'month': args.get('month') or 'Quarter',
+        'selectedBusinessUnits': tuple(args.getlist('businessUnits')),
+        'selectedCustomers': tuple(args.getlist('customers')),
+        'selectedLocations': tuple(args.getlist('locations')),
+        'selectedBillableStatus': tuple(args.getlist('billableStatus')),
+    }
+    location = args.get('location')
+    if location and location != 'All':
+        filters['selectedLocations'] = (location,)
+    return filters
+
+PAGE_ARGS = ('limit', 'offset', 'sort', 'fields', 'cursor')
+PAGE_LIMIT_DEFAULT = 100
+PAGE_LIMIT_MAX = 1000
+
+def get_employees_view_columns(quarter=max_quarter):
+    _, _, without_ctc = load_employees(quarter=quarter)
+    return [column for column in without_ctc.columns if not column.startswith('AllocationFTECapped_')] + ['FTE']
+
+def parse_page_args(args, columns):
+    """Read the paging arguments, or None if none of them is given
+
+    limit and offset select a page; cursor, the next_cursor of the previous
+    page, continues after its last row instead of at an offset. sort is a
+    comma-separated list of columns, '-' for descending, and fields limits
+    the columns returned. Raises ValueError for invalid arguments.
+    """
+    if not any(name in args for name in PAGE_ARGS):
+        return None
+
+    try:
+        limit = int(args.get('limit', PAGE_LIMIT_DEFAULT))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ValueError('limit and offset must be integers')
+    if not 1 <= limit <= PAGE_LIMIT_MAX or offset < 0:
+        raise ValueError(f'limit must be between 1 and {PAGE_LIMIT_MAX} and offset must not be negative')
+    if 'cursor' in args and 'offset' in args:
+        raise ValueError('use either offset or cursor')
+
+    sort = [name.strip() for name in args.get('sort', '').split(',') if name.strip()]
+    fields = tuple(name.strip() for name in args.get('fields', '').split(',') if name.strip())
+    unknown = [name for name in [name.lstrip('-') for name in sort] + list(fields) if name not in columns]
+    if unknown:
+        raise ValueError(f'Unknown columns: {unknown}')
+
+    # 'id' is unique, so with it as the last key every row has a fixed place
+    sort = [(name.lstrip('-'), not name.startswith('-')) for name in sort or ROSTER_GROUPING_COLUMNS]
+    if 'id' not in [column for column, _ in sort]:
+        sort.append(('id', True))
+
+    cursor = args.get('cursor')
+    if cursor is not None:
+        cursor = decode_cursor(cursor)
+        if len(cursor) != len(sort):
+            raise ValueError('Invalid cursor')
+
+    return {'limit': limit, 'offset': offset, 'sort': tuple(sort), 'fields': fields, 'cursor': cursor}
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def paginate(df, page):
+    """Sort df and cut out one page, returning (page, metadata)
+
+    The cursor of a page is the sort key of its last row, so it keeps working
+    after the data is refreshed.
+    """
+    sort_columns = [column for column, _ in page['sort']]
+    ascending = [is_ascending for _, is_ascending in page['sort']]
+    ordered = df.sort_values(sort_columns, ascending=ascending, kind='mergesort', ignore_index=True)
+
+    start = page['offset']
+    if page['cursor'] is not None:
+        start = position_after(ordered, sort_columns, ascending, page['cursor'])
+
+    rows = ordered.iloc[start:start + page['limit']]
+    end = start + len(rows)
+    next_cursor = None
+    if end < len(ordered):
+        last_key = ordered.loc[[end - 1], sort_columns].to_dict(orient='records')[0]
+        next_cursor = encode_cursor(list(last_key.values()))
+    if page['fields']:
+        rows = rows[list(page['fields'])]
+
+    return rows, {'total': len(ordered), 'offset': start, 'limit': page['limit'], 'next_cursor': next_cursor}
+
+def position_after(ordered, columns, ascending, key):
+    """Position of the first row of ordered that sorts after key"""
+    after = np.zeros(len(ordered), dtype=bool)
+    equal = np.ones(len(ordered), dtype=bool)
+    for column, is_ascending, value in zip(columns, ascending, key):
+        values = ordered[column]
+        after |= equal & ((values > value) if is_ascending else (values < value)).to_numpy()
+        equal &= (values == value).to_numpy()
+    return int(np.argmax(after)) if after.any() else len(ordered)
+
+def build_employees_view(user_bus, filters, quarter=max_quarter):
+    """The user's roster matching filters, with the FTE of the selected month as 'FTE'"""
+    _,df,_ = load_employees(user_bus, quarter)
+
+    fte_col = month_fte_column(df, filters['month'])
+    columns = [column for column in df.columns if column not in FTE_COLUMNS or column == fte_col]
+    df_reduced = select_roster(df, filters, columns)
+    df_reduced.rename(columns={fte_col: 'FTE'}, inplace=True)
+    df_reduced['FTE'] = df_reduced['FTE'].round(2)
+    return df_reduced
 
 
 def get_quarter_months(fiscal_quarter):
@@ -928,33 +1655,266 @@ def get_quarter_months(fiscal_quarter):
    
    return result
 
+def build_customers(df):
+    """Unique customer/BU pairs with their per-BU partitions"""
+    customers = df[['PrismCustomerGroup', 'FinalBU']].drop_duplicates()
+    return customers, partition_by_bu(customers)
+
+def get_customers_data():
+    return get_derived_data('customers', build_customers)
+
 @app.route('/api/customers')
 def get_customers():
     """Get customers for the user based on their BU access"""
     user_bus = get_user_bus()
-    df = get_cached_data()
     
-    if user_bus is None:
-        # User has 'All' access
-        filtered_df = df.copy()
-    elif len(user_bus) == 0:
+    if user_bus is not None and len(user_bus) == 0:
         # User not in permissions - return empty
         return jsonify([])
-    else:
-        # User has specific BU access
-        filtered_df = df[df['FinalBU'].isin(user_bus)]
     
     # Get unique customers for the accessible BUs
-    unique_customers = filtered_df[['PrismCustomerGroup', 'FinalBU']].drop_duplicates()
-    return jsonify(unique_customers.to_dict(orient='records'))
+    def build_user_customers():
+        customers, partitions = get_customers_data()
+        return select_bu_partitions(customers, partitions, user_bus)
+
+    return cached_frame_response('customers', [rac_cache], build_user_customers, bu_key(user_bus))
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """Report hit/miss counts and refresh latency for the data caches"""
+    return jsonify(
+        [cache.stats() for cache in DATA_CACHES + (trends_cache,)]
+        + [{**cost_caches.stats(), 'name': 'quarters'}, {'name': 'responses', **response_cache.stats()}]
+    )
+
+@app.route('/healthz/ready')
+def get_readiness():
+    """Report whether every dataset is loaded, and its generation; never triggers a load"""
+    datasets = {
+        cache.name: {'loaded': cache.loaded, 'generation': cache.generation}
+        for cache in DATA_CACHES
+    }
+    ready = all(dataset['loaded'] for dataset in datasets.values())
+    return jsonify({'ready': ready, 'datasets': datasets}), 200 if ready else 503
 
 @app.route('/api/period')
 def get_period():
     """Get Quarter and Month names and numbers for filtering"""
-    df = get_cached_data()
+    quarter, error_response = quarter_from_args(request.args)
+    if error_response:
+        return error_response
+    df = get_cached_data(quarter)
     current_quarter = df['Quarter'].unique()[0]
     period_dict = get_quarter_months(current_quarter)
     return period_dict
 
+TRENDS_PATH = os.path.join(SNAPSHOT_DIR, 'trends.arrow') if SNAPSHOT_DIR else ''
+TRENDS_ETAGS_KEY = b'cost_etags'
+
+# (quarter -> cost file ETag, cost rollup) last loaded by load_trends
+_trends = None
+
+def build_cost_rollup(previous=None):
+    """Roll up every quarter's cost data for the trends
+
+    Rows of quarters whose cost file has the ETag recorded in previous, a
+    (quarter -> ETag, rollup) pair, are reused. A quarter loaded for requests
+    is rolled up from that copy only if it was read at the file's current
+    ETag; other quarters are parsed and dropped again one at a time. Returns
+    the same kind of pair.
+    """
+    etags = cost_blob_etags()
+    previous_etags, previous_rollup = previous or ({}, None)
+    parts = []
+    for quarter, etag in etags.items():
+        if previous_etags.get(quarter) == etag:
+            parts.append(previous_rollup[previous_rollup['Quarter'] == quarter])
+            continue
+
+        if cost_caches.is_loaded(quarter):
+            df = get_cached_data(quarter)
+            if blob_csv_etag("rac-gm", cost_blob(quarter), df) == etag:
+                parts.append(rollup_cost(df, quarter))
+                continue
+
+        parts.append(rollup_cost(get_data(quarter, shared=False), quarter))
+        # The ETag actually read, in case the file changed since it was listed
+        etags[quarter] = _blob_csv_cache[("rac-gm", cost_blob(quarter))][0]
+        if not cost_caches.is_loaded(quarter):
+            forget_blob_csv("rac-gm", cost_blob(quarter))
+        elif shared_data_enabled():
+            # Requests use the shared copy
+            _blob_csv_cache.pop(("rac-gm", cost_blob(quarter)), None)
+
+    if not parts:
+        return etags, compact_rollup(pd.DataFrame(columns=TREND_KEYS + ['FTE', 'Cost']))
+    return etags, compact_rollup(pd.concat(parts, ignore_index=True))
+
+def read_trends_file():
+    """The rollup stored by load_trends as (quarter -> ETag, rollup), or None"""
+    if not (snapshots_enabled() and os.path.exists(TRENDS_PATH)):
+        return None
+    try:
+        table = map_table(TRENDS_PATH)
+        return json.loads(table.schema.metadata[TRENDS_ETAGS_KEY]), table.to_pandas()
+    except Exception as e:
+        app.logger.warning(f"Ignoring unreadable trends file {TRENDS_PATH}: {e}")
+        return None
+
+def load_trends():
+    """The cost rollup behind /api/trends, updated for cost files that changed
+
+    The rollup is kept next to the snapshots, so only new or changed quarters
+    are read from blob storage. While no cost file changes the previous object
+    is returned and the trends cache only extends its lifetime.
+    """
+    global _trends
+    previous = _trends or read_trends_file()
+    etags, rollup = build_cost_rollup(previous)
+    if previous is not None and etags == previous[0]:
+        _trends = previous
+        return previous[1]
+
+    if snapshots_enabled():
+        try:
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            write_table(TRENDS_PATH, rollup, {TRENDS_ETAGS_KEY: json.dumps(etags).encode()})
+        except Exception as e:
+            app.logger.warning(f"Could not write trends file {TRENDS_PATH}: {e}")
+    _trends = (etags, rollup)
+    return rollup
+
+trends_cache = DataCache('trends', load_trends, ttl=CACHE_TTL_SECONDS)
+
+def get_trend_revenue():
+    return derived_data.get(
+        'trend_revenue',
+        lambda prism, cost: rollup_revenue(prism, list(cost['Quarter'].unique()), get_quarter_months),
+        prism_cache, trends_cache
+    )
+
+TREND_GRAINS = ('quarter', 'month')
+
+@app.route('/api/trends')
+def get_trends():
+    """FTE, cost, CPC, revenue and GM% per quarter or month across quarters
+
+    groupBy is one of TREND_GROUPS (default bu) and grain quarter or month.
+    businessUnits, customers and quarters may be repeated to narrow the result;
+    BUs outside the user's permissions are never returned.
+    """
+    group_by = request.args.get('groupBy', 'bu')
+    grain = request.args.get('grain', 'quarter')
+    quarters = tuple(request.args.getlist('quarters'))
+    if group_by not in TREND_GROUPS:
+        return jsonify({'error': f'groupBy must be one of {", ".join(TREND_GROUPS)}'}), 400
+    if grain not in TREND_GRAINS:
+        return jsonify({'error': f'grain must be one of {", ".join(TREND_GRAINS)}'}), 400
+    if not all(QUARTER_PATTERN.fullmatch(quarter) for quarter in quarters):
+        return jsonify({'error': 'quarters must look like Q1FY2026'}), 400
+
+    user_bus = get_user_bus()
+    bus = tuple(request.args.getlist('businessUnits')) or None
+    if user_bus is not None:
+        bus = tuple(bu for bu in bus if bu in user_bus) if bus is not None else tuple(user_bus)
+    customers = tuple(request.args.getlist('customers'))
+
+    def build_trends():
+        return trend_series(trends_cache.get(), get_trend_revenue(), group_by, grain, bus, customers, quarters)
+
+    return cached_frame_response(
+        'trends', [trends_cache, prism_cache], build_trends, group_by, grain, bus, customers, quarters
+    )
+
+@app.route('/api/quarters')
+def get_quarters():
+    """Quarters with cost data, for the quarter argument of the other endpoints"""
+    return jsonify({'quarters': quarters_cache.get(), 'default': max_quarter})
+
+def warmup():
+    """Load every dataset and build the derived data before requests arrive
+
+    A failing step is logged and left for the first request to retry.
+    """
+    started = time.perf_counter()
+    steps = [cache.get for cache in DATA_CACHES] + [
+        get_roster, get_roster_partitions, get_customers_data, get_cpc_index, get_revenue_cube,
+        get_allocation_cube, get_gm_details_data, get_employee_search_index
+    ]
+    for step in steps:
+        try:
+            step()
+        except Exception:
+            app.logger.exception(f"Warmup step {step.__qualname__} failed")
+    app.logger.info(f"Warmup finished in {time.perf_counter() - started:.2f}s")
+
+def create_app():
+    """App factory for gunicorn, see gunicorn.conf.py
+
+    With preload_app the warmup runs once in the master and the workers
+    inherit the loaded data copy-on-write.
+    """
+    warmup()
+    return app
+
+@app.cli.command('build-snapshots')
+def build_snapshots():
+    """Store the cost, prism, plan and ODC CSVs as local columnar snapshots"""
+    if not snapshots_enabled():
+        print("Snapshots are disabled (pyarrow is not installed or SNAPSHOT_DIR is empty)")
+        return
+
+    for name, loader in [('cost', get_data), ('prism', load_prism_data), ('plan', load_plan_data), ('odc', load_odc_data)]:
+        df = loader()
+        print(f"{name}: {len(df)} rows, {len(df.columns)} columns")
+    print(f"Snapshots written to {SNAPSHOT_DIR}")
+
+@app.cli.command('build-trends')
+def build_trends():
+    """Roll up the cost data of every quarter for /api/trends, reading only changed quarters"""
+    rollup = load_trends()
+    print(f"{rollup['Quarter'].nunique()} quarters, {len(rollup)} rows, {frame_memory_mb(rollup):.1f} MB")
+    if snapshots_enabled():
+        print(f"Trends written to {TRENDS_PATH}")
+    else:
+        print("Trends are not stored (pyarrow is not installed or SNAPSHOT_DIR is empty)")
+
+@app.cli.command('publish-shared-data')
+def publish_shared_data():
+    """Load the cost, prism, plan and ODC data into SHARED_DATA_DIR for the workers on this host"""
+    if not shared_data_enabled():
+        print("Shared data is disabled (SHARED_DATA_DIR is empty, or pyarrow or fcntl is unavailable)")
+        return
+
+    for name, loader in [('cost', get_data), ('prism', load_prism_data), ('plan', load_plan_data), ('odc', load_odc_data)]:
+        df = loader()
+        print(f"{name}: {len(df)} rows, {len(df.columns)} columns")
+    for shared_frame in _shared_frames.values():
+        print(f"{shared_frame.name}: generation {shared_frame.generation}")
+
+@app.cli.command('memory-report')
+def memory_report():
+    """Compare the memory held by the cost data as a plain parse and with the cost schema"""
+    content = get_container_client("rac-gm").get_blob_client(COST_BLOB).download_blob().readall()
+
+    def parse_plain():
+        return pd.read_csv(io.BytesIO(content), low_memory=False)
+
+    def parse_with_schema():
+        df = pd.read_csv(
+            io.BytesIO(content), low_memory=False,
+            usecols=lambda column: column in COST_COLUMNS, dtype=COST_DTYPES
+        )
+        return apply_cost_schema(df)
+
+    for label, parse in [('plain', parse_plain), ('schema', parse_with_schema)]:
+        gc.collect()
+        rss_before = current_rss_mb()
+        df = parse()
+        rss_after = current_rss_mb()
+        rss = f", RSS {rss_before:.1f} -> {rss_after:.1f} MB" if rss_before is not None else ""
+        print(f"{label}: {len(df)} rows x {len(df.columns)} columns, {frame_memory_mb(df):.1f} MB{rss}")
+        del df
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Compare the collapsed audit-log replay with replaying entry by entry
+
+Usage: python bench_audit_replay.py [roster rows] [log entries]
+
+Checks that both give the same roster on random logs, including edits and
+removals of added rows and additions after removals, then times them.
+"""
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import apply_audit_log_to_dataframe
+
+
+def replay_entry_by_entry(df, audit_log):
+    """The previous implementation, kept as the reference"""
+    result = df.to_dict('records')
+
+    for entry in audit_log:
+        action = entry['action']
+
+        if action == 'EDIT_FTE':
+            employee_id = entry['employeeId']
+            new_value = entry['newValue']
+            for row in result:
+                if row['id'] == employee_id:
+                    row['FTE'] = float(new_value)
+
+        elif action == 'REMOVE_EMPLOYEE':
+            employee_id = entry['employeeId']
+            result = [row for row in result if row['id'] != employee_id]
+
+        elif action == 'ADD_EMPLOYEE' and 'employeeData' in entry:
+            result.append(entry['employeeData'])
+
+    return pd.DataFrame(result)
+
+
+def make_roster(rows, rng):
+    return pd.DataFrame({
+        'id': [f'E{i}' for i in range(rows)],
+        'EmployeeName': [f'Employee {i}' for i in range(rows)],
+        'FinalBU': rng.choice(['BU1', 'BU2', 'BU3'], rows),
+        'BillableYN': rng.choice(['Y', 'N'], rows),
+        'FTE': rng.integers(0, 5, rows) / 4,
+    })
+
+
+def make_audit_log(roster, entries, seed):
+    """Random edits, removals and additions over roster ids and added ids"""
+    rnd = random.Random(seed)
+    ids = list(roster['id'])
+    added_ids = []
+    log = []
+    for n in range(entries):
+        kind = rnd.random()
+        employee_id = rnd.choice(added_ids) if added_ids and rnd.random() < 0.3 else rnd.choice(ids)
+        if kind < 0.6:
+            log.append({'action': 'EDIT_FTE', 'employeeId': employee_id, 'newValue': str(rnd.randint(0, 4) / 4)})
+        elif kind < 0.8:
+            log.append({'action': 'REMOVE_EMPLOYEE', 'employeeId': employee_id})
+        else:
+            # Re-adding a removed id or adding a new one, sometimes with extra fields
+            new_id = employee_id if rnd.random() < 0.3 else f'N{n}'
+            data = {'id': new_id, 'EmployeeName': f'New {n}', 'FinalBU': 'BU1', 'BillableYN': 'Y', 'FTE': 1.0}
+            if rnd.random() < 0.2:
+                data['Note'] = 'added'
+            added_ids.append(new_id)
+            log.append({'action': 'ADD_EMPLOYEE', 'employeeData': data})
+    return log
+
+
+def best_time(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check(roster, log):
+    # The legacy replay mutates added rows in place, so each side gets its own copy
+    expected = replay_entry_by_entry(roster, [dict(e, employeeData=dict(e['employeeData'])) if 'employeeData' in e else e for e in log])
+    actual = apply_audit_log_to_dataframe(roster, log)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = np.random.default_rng(0)
+
+    for seed in range(200):
+        check(make_roster(20, rng), make_audit_log(make_roster(20, rng), 30, seed))
+    small = make_roster(3, rng)
+    check(small, [{'action': 'REMOVE_EMPLOYEE', 'employeeId': i} for i in small['id']])
+    check(small, [{'action': 'REMOVE_EMPLOYEE', 'employeeId': 'E0'},
+                  {'action': 'ADD_EMPLOYEE', 'employeeData': {'id': 'E0', 'FTE': 0.5}},
+                  {'action': 'EDIT_FTE', 'employeeId': 'E0', 'newValue': '0.25'}])
+    print('Results match the entry-by-entry replay')
+
+    roster = make_roster(rows, rng)
+    log = make_audit_log(roster, entries, 0)
+    legacy = best_time(replay_entry_by_entry, roster, log)
+    collapsed = best_time(apply_audit_log_to_dataframe, roster, log)
+    print(f'{rows} rows, {entries} log entries')
+    print(f'entry by entry: {legacy * 1000:9.1f} ms')
+    print(f'collapsed:      {collapsed * 1000:9.1f} ms ({legacy / collapsed:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import AzureCliCredential, ManagedIdentityCredential
+from azure.storage.blob import BlobServiceClient
+
+DEFAULT_ACCOUNT_URL = "https://sonataonefpa.blob.core.windows.net/"
+
+# Connections kept open per host; gunicorn threads share one pool per worker
+POOL_SIZE = int(os.environ.get('BLOB_POOL_SIZE', 16))
+
+
+class CachedTokenCredential:
+    """Wrap a credential so tokens are reused until shortly before they expire
+
+    AzureCliCredential spawns `az` for every token, so without this each new
+    client would pay for a subprocess.
+    """
+
+    def __init__(self, credential, refresh_margin=300):
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        if kwargs.get('claims'):
+            # Claims challenges always need a fresh token
+            return self._credential.get_token(*scopes, **kwargs)
+
+        key = (scopes, tuple(sorted(kwargs.items())))
+        token = self._tokens.get(key)
+        if token is None or token.expires_on - self._refresh_margin <= time.time():
+            with self._lock:
+                token = self._tokens.get(key)
+                if token is None or token.expires_on - self._refresh_margin <= time.time():
+                    token = self._credential.get_token(*scopes, **kwargs)
+                    self._tokens[key] = token
+        return token
+
+    def close(self):
+        close = getattr(self._credential, 'close', None)
+        if close is not None:
+            close()
+
+
+def get_credential():
+    '''Get the credential based on the environment'''
+    # Check if running in Azure (presence of IDENTITY_ENDPOINT environment variable)
+    if "IDENTITY_ENDPOINT" in os.environ:
+        return CachedTokenCredential(ManagedIdentityCredential())
+    else:
+        return CachedTokenCredential(AzureCliCredential())
+
+
+def create_blob_service_client():
+    """Create a client with a pooled HTTP transport
+
+    AZURE_STORAGE_CONNECTION_STRING (e.g. an Azurite emulator) takes precedence
+    over BLOB_ACCOUNT_URL, which defaults to the production storage account.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    transport = RequestsTransport(session=session, session_owner=False)
+
+    connection_string = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+    if connection_string:
+        return BlobServiceClient.from_connection_string(connection_string, transport=transport)
+
+    account_url = os.environ.get('BLOB_ACCOUNT_URL', DEFAULT_ACCOUNT_URL)
+    return BlobServiceClient(account_url, credential=get_credential(), transport=transport)
+
+
+_lock = threading.Lock()
+_service_client = None
+_container_clients = {}
+_pid = None
+
+
+def _reset():
+    global _lock, _service_client, _container_clients, _pid
+    # A forked child must not share sockets (or a held lock) with its parent
+    _lock = threading.Lock()
+    _service_client = None
+    _container_clients = {}
+    _pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+
+def get_blob_service_client():
+    """Return the process-wide blob service client, creating it on first use"""
+    global _service_client, _pid
+
+    if _service_client is None or _pid != os.getpid():
+        with _lock:
+            if _service_client is None or _pid != os.getpid():
+                _container_clients.clear()
+                _service_client = create_blob_service_client()
+                _pid = os.getpid()
+    return _service_client
+
+
+def get_container_client(container_name):
+    """Return the shared client for a container such as 'rac-gm' or 'testpoccontainer'"""
+    service_client = get_blob_service_client()
+    container_client = _container_clients.get(container_name)
+    if container_client is None:
+        with _lock:
+            container_client = _container_clients.get(container_name)
+            if container_client is None:
+                container_client = service_client.get_container_client(container_name)
+                _container_clients[container_name] = container_client
+    return container_client
@@ -0,0 +1,341 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class DataCache:
+    """Cache a dataset returned by loader() for ttl seconds
+
+    Only one thread runs the loader at a time. Once the data has expired the
+    stale copy is served while a single background thread refreshes it, unless
+    serve_stale is False, in which case callers wait for the refresh.
+
+    The generation is bumped whenever the loader returns a new object. A loader
+    that returns the object it returned last time only extends its lifetime.
+    """
+
+    def __init__(self, name, loader, ttl=3600, serve_stale=True, retry_interval=60):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.serve_stale = serve_stale
+        self.retry_interval = retry_interval
+        # ((value, generation), loaded_at), replaced as a whole so readers
+        # without the lock never see a value and load time that don't match
+        self._state = ((None, 0), None)
+        self._failed_at = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'unchanged_refreshes': 0,
+            'errors': 0,
+        }
+        self._last_refresh_seconds = None
+        self._total_refresh_seconds = 0.0
+
+    @property
+    def generation(self):
+        return self._state[0][1]
+
+    @property
+    def loaded(self):
+        return self._state[1] is not None
+
+    def age(self):
+        """Seconds since the data was last loaded or confirmed unchanged"""
+        loaded_at = self._state[1]
+        if loaded_at is None:
+            return None
+        return time.monotonic() - loaded_at
+
+    def get(self):
+        return self.get_entry()[0]
+
+    def get_entry(self):
+        """Return (value, generation), loading or refreshing as needed"""
+        entry, loaded_at = self._state
+        if self._is_fresh(loaded_at):
+            self._counters['hits'] += 1
+            return entry
+
+        if loaded_at is not None and self.serve_stale:
+            self._counters['stale_hits'] += 1
+            self._start_background_refresh()
+            return entry
+
+        with self._lock:
+            entry, loaded_at = self._state
+            if self._is_fresh(loaded_at):
+                self._counters['hits'] += 1
+                return entry
+
+            self._counters['misses'] += 1
+            try:
+                self._refresh()
+            except Exception:
+                if not self.loaded:
+                    raise
+                # Keep serving the old data until the next retry
+            return self._state[0]
+
+    def clear(self, blocking=True):
+        """Drop the loaded value so the next get loads it again
+
+        The generation is kept, so whatever is loaded next is a new generation.
+        With blocking=False nothing is cleared while the cache is being
+        refreshed, and False is returned.
+        """
+        if not self._lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._state = ((None, self.generation), None)
+        finally:
+            self._lock.release()
+        return True
+
+    def stats(self):
+        age = self.age()
+        return {
+            'name': self.name,
+            'generation': self.generation,
+            'loaded': self.loaded,
+            'age_seconds': round(age, 1) if age is not None else None,
+            'ttl_seconds': self.ttl,
+            'refreshing': self._lock.locked(),
+            **self._counters,
+            'last_refresh_seconds': self._last_refresh_seconds,
+            'total_refresh_seconds': round(self._total_refresh_seconds, 3),
+        }
+
+    def _is_fresh(self, loaded_at=None):
+        if loaded_at is None:
+            loaded_at = self._state[1]
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def _recently_failed(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_interval
+
+    def _start_background_refresh(self):
+        if self._recently_failed() or not self._lock.acquire(blocking=False):
+            return
+
+        if self._is_fresh():
+            self._lock.release()
+            return
+
+        def refresh():
+            try:
+                self._refresh()
+            except Exception:
+                pass  # Already logged, the stale data stays in place
+            finally:
+                self._lock.release()
+
+        try:
+            threading.Thread(target=refresh, name=f'{self.name}-cache-refresh', daemon=True).start()
+        except Exception:
+            self._lock.release()
+            raise
+
+    def _refresh(self):
+        """Run the loader, must be called with the lock held"""
+        started = time.perf_counter()
+        try:
+            value = self.loader()
+        except Exception:
+            self._failed_at = time.monotonic()
+            self._counters['errors'] += 1
+            logger.exception(f"Error refreshing {self.name} cache")
+            raise
+
+        elapsed = time.perf_counter() - started
+        entry, loaded_at = self._state
+        unchanged = loaded_at is not None and value is entry[0]
+        if unchanged:
+            self._counters['unchanged_refreshes'] += 1
+        else:
+            entry = (value, entry[1] + 1)
+
+        self._state = (entry, time.monotonic())
+        self._failed_at = None
+        self._counters['refreshes'] += 1
+        self._last_refresh_seconds = round(elapsed, 3)
+        self._total_refresh_seconds += elapsed
+        if unchanged:
+            logger.info(f"{self.name} data unchanged, cache extended after {elapsed:.2f}s")
+        else:
+            logger.info(f"Refreshed {self.name} cache in {elapsed:.2f}s (generation {self.generation})")
+
+
+class DerivedCache:
+    """Datasets computed from one or more DataCaches
+
+    A derived dataset is rebuilt the first time it is requested after any of its
+    sources moves to a new generation.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        # Re-entrant so builders can use other derived datasets
+        self._lock = threading.RLock()
+
+    def get(self, name, builder, *sources):
+        entries = [source.get_entry() for source in sources]
+        values = [value for value, _ in entries]
+        key = tuple(generation for _, generation in entries)
+
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+
+            result = builder(*values)
+            self._entries[name] = (key, result)
+            return result
+
+    def discard(self, predicate):
+        """Drop the datasets whose name matches predicate(name)"""
+        with self._lock:
+            for name in [name for name in self._entries if predicate(name)]:
+                del self._entries[name]
+
+
+class DataCacheLRU:
+    """A DataCache per key, created on first use, with a memory budget across keys
+
+    loader(key) loads a key's data and size_of(value) gives the bytes it holds.
+    When a load takes the total past max_bytes the least recently used other
+    keys are cleared, except pinned ones and ones being refreshed, and
+    on_evict(key) is called for each so dependent data can be dropped too.
+
+    Loads run with their DataCache's lock held, so on_evict is deferred to the
+    next cache() call rather than taking other locks while holding it.
+    """
+
+    def __init__(self, name, loader, size_of, max_bytes, pinned=(), on_evict=None, **cache_options):
+        self.name = name
+        self.loader = loader
+        self.size_of = size_of
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        self.on_evict = on_evict
+        self.cache_options = cache_options
+        self._caches = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._evicted = []
+
+    def cache(self, key):
+        """Return the DataCache of key, marking it as the most recently used"""
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is None:
+                cache = DataCache(f'{self.name}:{key}', lambda: self._load(key), **self.cache_options)
+                self._caches[key] = cache
+            self._caches.move_to_end(key)
+            # Keys loaded again since their eviction keep their dependent data
+            evicted = [evicted_key for evicted_key in self._evicted if evicted_key not in self._sizes]
+            self._evicted = []
+        if self.on_evict is not None:
+            for evicted_key in evicted:
+                self.on_evict(evicted_key)
+        return cache
+
+    def is_loaded(self, key):
+        """Whether key's data is loaded, without marking it as used"""
+        with self._lock:
+            return key in self._sizes
+
+    def _load(self, key):
+        value = self.loader(key)
+        with self._lock:
+            self._sizes[key] = self.size_of(value)
+            evicted = self._evict(keep=key)
+            self._evicted.extend(evicted)
+        for evicted_key in evicted:
+            logger.info(f"Evicted {self.name}:{evicted_key} data to stay within {self.max_bytes / 1024 ** 2:.0f} MB")
+        return value
+
+    def _evict(self, keep):
+        """Clear least recently used caches until within budget, must be called with the lock held"""
+        evicted = []
+        for key, cache in list(self._caches.items()):
+            if sum(self._sizes.values()) <= self.max_bytes:
+                break
+            # A cache being refreshed is skipped rather than waited for, its
+            # load needs this LRU's lock to finish
+            if key == keep or key in self.pinned or key not in self._sizes or not cache.clear(blocking=False):
+                continue
+            del self._sizes[key]
+            evicted.append(key)
+        self._evictions += len(evicted)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'loaded': list(self._sizes),
+                'size_mb': round(sum(self._sizes.values()) / 1024 ** 2, 1),
+                'max_mb': round(self.max_bytes / 1024 ** 2, 1),
+                'evictions': self._evictions,
+            }
+
+
+class ResponseCache:
+    """Encoded response bodies, evicting the least recently used past max_bytes
+
+    Each entry is an (etag, body, content encoding) tuple.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry[1])
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._size -= len(old_entry[1])
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+                self._counters['evictions'] += 1
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            **self._counters,
+        }
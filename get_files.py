@@ -3,21 +3,51 @@ import requests
 import pandas as pd
 import time
 import json
+import os
+import random
+import sys
+from requests.adapters import HTTPAdapter
 
-def main():
-    # Azure AD details
-    tenant_id = "7571a489-bd29-4f38-b9a6-7c880f8cddf0"
-    client_id = "6d9e48da-c659-4f2a-891c-75f943a8dca9"
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
+# Azure AD details
+TENANT_ID = "7571a489-bd29-4f38-b9a6-7c880f8cddf0"
+CLIENT_ID = "6d9e48da-c659-4f2a-891c-75f943a8dca9"
+
+# SharePoint site and list details
+SITE_URL = "o365sonata.sharepoint.com:/sites/PrismRebuild"
+LIST_ID = "4dcd6680-b9a1-444f-9519-3d8f5011e6e7"
+
+# GRAPH_URL and GRAPH_TOKEN point the export at another server, e.g. a local mock,
+# and skip the device code sign-in
+GRAPH_URL = os.environ.get('GRAPH_URL', 'https://graph.microsoft.com/v1.0').rstrip('/')
+GRAPH_TOKEN = os.environ.get('GRAPH_TOKEN', '')
+
+# The prism revenue fields the app reads from the export
+DEFAULT_LIST_FIELDS = ['Title', 'BU', 'Quarter', 'FinancialYear', 'Month', 'Total_Revenue']
+# LIST_FIELDS overrides them with a comma-separated list, '*' downloads every field
+LIST_FIELDS = [field.strip() for field in os.environ.get('LIST_FIELDS', ','.join(DEFAULT_LIST_FIELDS)).split(',') if field.strip()]
+if LIST_FIELDS == ['*']:
+    LIST_FIELDS = []
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 999))
+
+MAX_RETRIES = int(os.environ.get('MAX_RETRIES', 6))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+OUTPUT_BASE = "sharepoint_list_data"
+# Items already downloaded, one JSON object per line
+ITEMS_FILE = f"{OUTPUT_BASE}.jsonl"
+# The next page to download and the size of ITEMS_FILE once the previous page was written;
+# a rerun resumes from it unless --fresh is given
+CHECKPOINT_FILE = f"{OUTPUT_BASE}.checkpoint.json"
 
-    # SharePoint site and list details
-    site_url = "o365sonata.sharepoint.com:/sites/PrismRebuild"
-    list_id = "4dcd6680-b9a1-444f-9519-3d8f5011e6e7"
 
-    # Initialize MSAL client
+def get_access_token():
+    """Sign in with the device code flow, or use GRAPH_TOKEN when it is set"""
+    if GRAPH_TOKEN:
+        return GRAPH_TOKEN
+
     app = msal.PublicClientApplication(
-        client_id=client_id,
-        authority=authority
+        client_id=CLIENT_ID,
+        authority=f"https://login.microsoftonline.com/{TENANT_ID}"
     )
 
     # Required scopes for SharePoint list access
@@ -26,125 +56,209 @@ def main():
         'Sites.ReadWrite.All'  # Include if you need write access
     ]
 
-    # Use device code flow with timeout
     flow = app.initiate_device_flow(scopes)
-    if "user_code" in flow:
-        print('\n\n=== AUTHENTICATION REQUIRED ===')
-        print('To sign in, use a web browser to open the page https://microsoft.com/devicelogin')
-        print('and enter the code', flow['user_code'])
-        print('Waiting for you to complete the authentication...')
-        
-        # Add timeout and polling
-        max_time = 300  # 5 minutes timeout
-        start_time = time.time()
-        
-        while time.time() - start_time < max_time:
-            try:
-                result = app.acquire_token_by_device_flow(flow, timeout=5)  # 5 seconds timeout per attempt
-                if result and "access_token" in result:
-                    break
-            except Exception as e:
-                print(f"Polling error: {e}")
-            print("Still waiting for authentication... Please complete the device code flow in your browser.")
-            time.sleep(5)  # Wait 5 seconds before trying again
-        
-        if "access_token" in result:
-            print("✓ Successfully acquired token!")
-            access_token = result["access_token"]
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Accept': 'application/json'
-            }
-            
-            # Verify access to the site
-            print(f"\n=== Verifying access to site {site_url} ===")
-            site_response = requests.get(
-                f'https://graph.microsoft.com/v1.0/sites/{site_url}',
-                headers=headers
-            )
-            
-            if site_response.status_code == 200:
-                site_data = site_response.json()
-                site_id = site_data['id']
-                print(f"✓ Successfully connected to site: {site_data.get('displayName')}")
-                print(f"  Site ID: {site_id}")
-                
-                # Get list data
-                print(f"\n=== Retrieving data from list {list_id} ===")
-                list_response = requests.get(
-                    f'https://graph.microsoft.com/v1.0/sites/{site_id}/lists/{list_id}/items?$expand=fields',
-                    headers=headers
-                )
-                
-                if list_response.status_code == 200:
-                    list_data = list_response.json()
-                    items = list_data.get('value', [])
-                    
-                    # Handle pagination if there are more items
-                    while '@odata.nextLink' in list_data:
-                        next_page_url = list_data['@odata.nextLink']
-                        print(f"  Retrieving next page of items...")
-                        next_page_response = requests.get(next_page_url, headers=headers)
-                        
-                        if next_page_response.status_code == 200:
-                            next_page_data = next_page_response.json()
-                            items.extend(next_page_data.get('value', []))
-                            list_data = next_page_data
-                        else:
-                            print(f"  Error retrieving next page: {next_page_response.status_code}")
-                            print(f"  {next_page_response.text}")
-                            break
-                    
-                    print(f"✓ Retrieved {len(items)} items from the list")
-                    
-                    # Process the items - extract fields
-                    processed_items = []
-                    for item in items:
-                        fields = item.get('fields', {})
-                        # Remove @odata type information from field names
-                        cleaned_fields = {
-                            k.split('@')[0]: v for k, v in fields.items()
-                        }
-                        processed_items.append(cleaned_fields)
-                    
-                    # Convert to DataFrame
-                    df = pd.DataFrame(processed_items)
-                    
-                    # Display sample of data
-                    print("\n=== Data Sample (First 5 rows) ===")
-                    print(df.head())
-                    
-                    # Save to Excel
-                    output_file = "sharepoint_list_data.xlsx"
-                    df.to_excel(output_file, index=False)
-                    print(f"\n✓ Data saved to {output_file}")
-                    
-                    # Return info about retrieved data
-                    print("\n=== Data Information ===")
-                    print(f"  Number of rows: {len(df)}")
-                    print(f"  Number of columns: {len(df.columns)}")
-                    print("\n  Columns:")
-                    for col in df.columns:
-                        print(f"    - {col}")
-                    
-                    # Optional: Save to CSV as well
-                    df.to_csv("sharepoint_list_data.csv", index=False)
-                    print(f"✓ Data also saved to sharepoint_list_data.csv")
-                    
-                else:
-                    print(f"✗ Error retrieving list data: {list_response.status_code}")
-                    print(f"  Response: {list_response.text}")
-            else:
-                print(f"✗ Error accessing site: {site_response.status_code}")
-                print(f"  Response: {site_response.text}")
-        else:
-            print("✗ Failed to get token within timeout period")
-            print(f"  Error getting token: {result.get('error')}")
-            print(f"  Error description: {result.get('error_description')}")
-    else:
+    if "user_code" not in flow:
         print("✗ Error initiating device flow")
         print(f"  Error: {flow.get('error')}")
         print(f"  Error description: {flow.get('error_description')}")
+        return None
+
+    print('\n\n=== AUTHENTICATION REQUIRED ===')
+    print('To sign in, use a web browser to open the page https://microsoft.com/devicelogin')
+    print('and enter the code', flow['user_code'])
+    print('Waiting for you to complete the authentication...')
+
+    max_time = 300  # 5 minutes timeout
+    start_time = time.time()
+    result = {}
+    while time.time() - start_time < max_time:
+        try:
+            result = app.acquire_token_by_device_flow(flow, timeout=5)  # 5 seconds timeout per attempt
+            if result and "access_token" in result:
+                print("✓ Successfully acquired token!")
+                return result["access_token"]
+        except Exception as e:
+            print(f"Polling error: {e}")
+        print("Still waiting for authentication... Please complete the device code flow in your browser.")
+        time.sleep(5)
+
+    print("✗ Failed to get token within timeout period")
+    print(f"  Error getting token: {result.get('error')}")
+    print(f"  Error description: {result.get('error_description')}")
+    return None
+
+
+def new_session(access_token):
+    """A session reusing its connections to Graph for every page"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Authorization': f'Bearer {access_token}',
+        'Accept': 'application/json'
+    })
+    return session
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying: Retry-After when given, else exponential backoff with jitter"""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass  # An HTTP date, fall back to backoff
+    return min(2 ** attempt, 60) + random.uniform(0, 1)
+
+
+def get_json(session, url, params=None):
+    """GET a Graph URL, retrying throttling, server errors and dropped connections"""
+    for attempt in range(MAX_RETRIES + 1):
+        response = None
+        try:
+            response = session.get(url, params=params, timeout=60)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"  Request failed ({e}), retrying...")
+        else:
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                response.raise_for_status()
+                raise requests.HTTPError(f"Unexpected status {response.status_code}", response=response)
+            print(f"  Got {response.status_code}, retrying...")
+
+        time.sleep(retry_delay(response, attempt))
+
+
+def first_page_request(site_id):
+    """URL and query parameters of the first page of list items"""
+    fields = f"fields($select={','.join(LIST_FIELDS)})" if LIST_FIELDS else "fields"
+    params = {'$expand': fields, '$top': PAGE_SIZE}
+    if LIST_FIELDS:
+        params['$select'] = 'id'
+    return f"{GRAPH_URL}/sites/{site_id}/lists/{LIST_ID}/items", params
+
+
+def clean_fields(item):
+    """An item's fields without the @odata type annotations"""
+    fields = item.get('fields', {})
+    return {k.split('@')[0]: v for k, v in fields.items()}
+
+
+def read_checkpoint():
+    try:
+        with open(CHECKPOINT_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(checkpoint):
+    tmp_path = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def download_items(session, site_id, resume=True):
+    """Download every list item into ITEMS_FILE, page by page
+
+    Pages follow @odata.nextLink, so they are requested one after another.
+    After each page the next link is checkpointed; a rerun continues from it
+    and drops anything written after the checkpoint. Returns the number of
+    items in ITEMS_FILE.
+    """
+    checkpoint = read_checkpoint() if resume else None
+    if checkpoint is not None and os.path.exists(ITEMS_FILE):
+        print(f"  Resuming after {checkpoint['items']} items")
+        with open(ITEMS_FILE, 'r+b') as f:
+            f.truncate(checkpoint['offset'])
+        url, params = checkpoint['next_link'], None
+    else:
+        checkpoint = {'items': 0, 'offset': 0}
+        with open(ITEMS_FILE, 'wb'):
+            pass
+        url, params = first_page_request(site_id)
+
+    with open(ITEMS_FILE, 'ab') as items_file:
+        while url:
+            page = get_json(session, url, params)
+            params = None  # The next link carries the query
+            lines = [json.dumps(clean_fields(item)) + '\n' for item in page.get('value', [])]
+            items_file.write(''.join(lines).encode())
+            items_file.flush()
+            os.fsync(items_file.fileno())
+
+            url = page.get('@odata.nextLink')
+            checkpoint = {'next_link': url, 'items': checkpoint['items'] + len(lines), 'offset': items_file.tell()}
+            write_checkpoint(checkpoint)
+            print(f"  Retrieved {checkpoint['items']} items...")
+
+    return checkpoint['items']
+
+
+def main():
+    access_token = get_access_token()
+    if access_token is None:
+        return
+
+    session = new_session(access_token)
+
+    # Verify access to the site
+    print(f"\n=== Verifying access to site {SITE_URL} ===")
+    try:
+        site_data = get_json(session, f"{GRAPH_URL}/sites/{SITE_URL}")
+    except requests.HTTPError as e:
+        print(f"✗ Error accessing site: {e.response.status_code}")
+        print(f"  Response: {e.response.text}")
+        return
+    site_id = site_data['id']
+    print(f"✓ Successfully connected to site: {site_data.get('displayName')}")
+    print(f"  Site ID: {site_id}")
+
+    # Get list data
+    print(f"\n=== Retrieving data from list {LIST_ID} ===")
+    try:
+        item_count = download_items(session, site_id, resume='--fresh' not in sys.argv[1:])
+    except requests.RequestException as e:
+        response = getattr(e, 'response', None)
+        print(f"✗ Error retrieving list data: {response.status_code if response is not None else e}")
+        if response is not None:
+            print(f"  Response: {response.text}")
+        print(f"  Downloaded pages are kept in {ITEMS_FILE}, run again to resume")
+        return
+    print(f"✓ Retrieved {item_count} items from the list")
+
+    with open(ITEMS_FILE) as f:
+        df = pd.DataFrame([json.loads(line) for line in f])
+
+    # Display sample of data
+    print("\n=== Data Sample (First 5 rows) ===")
+    print(df.head())
+
+    # Save to Excel
+    output_file = f"{OUTPUT_BASE}.xlsx"
+    df.to_excel(output_file, index=False)
+    print(f"\n✓ Data saved to {output_file}")
+
+    # Return info about retrieved data
+    print("\n=== Data Information ===")
+    print(f"  Number of rows: {len(df)}")
+    print(f"  Number of columns: {len(df.columns)}")
+    print("\n  Columns:")
+    for col in df.columns:
+        print(f"    - {col}")
+
+    # Optional: Save to CSV as well
+    df.to_csv(f"{OUTPUT_BASE}.csv", index=False)
+    print(f"✓ Data also saved to {OUTPUT_BASE}.csv")
+
+    # The export is complete, the next run starts over
+    os.remove(CHECKPOINT_FILE)
+    os.remove(ITEMS_FILE)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,4 @@
+# Load the data in the master before forking, so workers start warm and
+# share the loaded pages copy-on-write
+wsgi_app = 'app:create_app()'
+preload_app = True
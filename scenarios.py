@@ -0,0 +1,254 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from datetime import datetime, timezone
+
+# Shared by the workers on a host; empty keeps scenarios in the process's memory,
+# which only works with a single worker
+SCENARIO_DB = os.environ.get('SCENARIO_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios.db'))
+
+SCENARIO_ACTIONS = ('EDIT_FTE', 'REMOVE_EMPLOYEE', 'ADD_EMPLOYEE')
+
+
+def entry_cost_impact(entry):
+    """(cost impact, customer, BU) of an audit entry with its gmImpact"""
+    gm_impact = entry.get('gmImpact') or {}
+    gm_data = entry.get('gmData') or {}
+    customer, bu = gm_data.get('PrismCustomerGroup'), gm_data.get('finalBU')
+    return (
+        float(gm_impact.get('costImpact') or 0),
+        None if customer is None else str(customer),
+        None if bu is None else str(bu),
+    )
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def scenario_summary(scenario_id, name, period, created_at, entry_count, cost_impact, by_customer, by_bu):
+    return {
+        'id': scenario_id,
+        'name': name,
+        'period': period,
+        'createdAt': created_at,
+        'entryCount': entry_count,
+        'totals': {
+            'costImpact': round(cost_impact, 2),
+            'byCustomer': {key: round(value, 2) for key, value in by_customer.items()},
+            'byBU': {key: round(value, 2) for key, value in by_bu.items()},
+        },
+    }
+
+
+class ScenarioStore:
+    """What-if scenarios: audit logs owned by a user with running cost totals
+
+    Appending an entry adds its cost impact to the scenario total and to the
+    totals of its customer and BU, so totals never need the log to be replayed.
+    A scenario is only visible to its owner; other owners get None as if it
+    didn't exist.
+    """
+
+    def __init__(self):
+        self._scenarios = {}
+        self._lock = threading.Lock()
+
+    def create(self, owner, name='', period=None):
+        scenario = {
+            'id': uuid.uuid4().hex,
+            'owner': owner,
+            'name': name,
+            'period': period,
+            'created_at': _now(),
+            'entries': [],
+            'cost_impact': 0.0,
+            'by_customer': {},
+            'by_bu': {},
+        }
+        with self._lock:
+            self._scenarios[scenario['id']] = scenario
+            return self._summary(scenario)
+
+    def list(self, owner):
+        with self._lock:
+            return [self._summary(s) for s in self._scenarios.values() if s['owner'] == owner]
+
+    def get(self, scenario_id, owner):
+        with self._lock:
+            scenario = self._find(scenario_id, owner)
+            return self._summary(scenario) if scenario else None
+
+    def entries(self, scenario_id, owner):
+        with self._lock:
+            scenario = self._find(scenario_id, owner)
+            return list(scenario['entries']) if scenario else None
+
+    def append(self, scenario_id, owner, entry):
+        """Add an entry carrying its gmImpact and return the updated summary"""
+        cost_impact, customer, bu = entry_cost_impact(entry)
+        with self._lock:
+            scenario = self._find(scenario_id, owner)
+            if scenario is None:
+                return None
+            scenario['entries'].append(entry)
+            scenario['cost_impact'] += cost_impact
+            if customer is not None:
+                scenario['by_customer'][customer] = scenario['by_customer'].get(customer, 0.0) + cost_impact
+            if bu is not None:
+                scenario['by_bu'][bu] = scenario['by_bu'].get(bu, 0.0) + cost_impact
+            return self._summary(scenario)
+
+    def delete(self, scenario_id, owner):
+        with self._lock:
+            if self._find(scenario_id, owner) is None:
+                return False
+            del self._scenarios[scenario_id]
+            return True
+
+    def _find(self, scenario_id, owner):
+        scenario = self._scenarios.get(scenario_id)
+        return scenario if scenario is not None and scenario['owner'] == owner else None
+
+    @staticmethod
+    def _summary(scenario):
+        return scenario_summary(
+            scenario['id'], scenario['name'], scenario['period'], scenario['created_at'],
+            len(scenario['entries']), scenario['cost_impact'], scenario['by_customer'], scenario['by_bu']
+        )
+
+
+class SQLiteScenarioStore(ScenarioStore):
+    """ScenarioStore kept in a SQLite file, shared by every worker on the host
+
+    Totals are stored next to the entries and updated in the same transaction
+    as each append.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scenarios (
+            id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            name TEXT NOT NULL,
+            period TEXT,
+            created_at TEXT NOT NULL,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            cost_impact REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS scenarios_owner ON scenarios (owner);
+        CREATE TABLE IF NOT EXISTS scenario_entries (
+            scenario_id TEXT NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            entry TEXT NOT NULL,
+            PRIMARY KEY (scenario_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS scenario_totals (
+            scenario_id TEXT NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            cost_impact REAL NOT NULL,
+            PRIMARY KEY (scenario_id, dimension, key)
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # The store is created at import, which gunicorn runs in the master, so
+        # no connection is kept for workers to inherit
+        with closing(sqlite3.connect(self.path, timeout=30)) as db:
+            db.executescript(self.SCHEMA)
+
+    def _connect(self):
+        """This thread's connection, opened again in a forked child"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def create(self, owner, name='', period=None):
+        scenario_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                'INSERT INTO scenarios (id, owner, name, period, created_at) VALUES (?, ?, ?, ?, ?)',
+                (scenario_id, owner, name, period, _now())
+            )
+            return self._load_summary(db, scenario_id, owner)
+
+    def list(self, owner):
+        db = self._connect()
+        rows = db.execute('SELECT id FROM scenarios WHERE owner = ? ORDER BY created_at', (owner,)).fetchall()
+        return [self._load_summary(db, scenario_id, owner) for scenario_id, in rows]
+
+    def get(self, scenario_id, owner):
+        return self._load_summary(self._connect(), scenario_id, owner)
+
+    def entries(self, scenario_id, owner):
+        db = self._connect()
+        if not self._owns(db, scenario_id, owner):
+            return None
+        rows = db.execute(
+            'SELECT entry FROM scenario_entries WHERE scenario_id = ? ORDER BY position', (scenario_id,)
+        ).fetchall()
+        return [json.loads(entry) for entry, in rows]
+
+    def append(self, scenario_id, owner, entry):
+        cost_impact, customer, bu = entry_cost_impact(entry)
+        with self._connect() as db:
+            # Updating the scenario first takes the write lock, so the position
+            # read back can't be taken by another worker's append
+            updated = db.execute(
+                'UPDATE scenarios SET entry_count = entry_count + 1, cost_impact = cost_impact + ? '
+                'WHERE id = ? AND owner = ?',
+                (cost_impact, scenario_id, owner)
+            )
+            if updated.rowcount == 0:
+                return None
+            position, = db.execute('SELECT entry_count - 1 FROM scenarios WHERE id = ?', (scenario_id,)).fetchone()
+            db.execute(
+                'INSERT INTO scenario_entries (scenario_id, position, entry) VALUES (?, ?, ?)',
+                (scenario_id, position, json.dumps(entry))
+            )
+            for dimension, key in (('customer', customer), ('bu', bu)):
+                if key is not None:
+                    db.execute(
+                        'INSERT INTO scenario_totals (scenario_id, dimension, key, cost_impact) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (scenario_id, dimension, key) DO UPDATE SET cost_impact = cost_impact + excluded.cost_impact',
+                        (scenario_id, dimension, key, cost_impact)
+                    )
+            return self._load_summary(db, scenario_id, owner)
+
+    def delete(self, scenario_id, owner):
+        with self._connect() as db:
+            return db.execute('DELETE FROM scenarios WHERE id = ? AND owner = ?', (scenario_id, owner)).rowcount > 0
+
+    @staticmethod
+    def _owns(db, scenario_id, owner):
+        return db.execute('SELECT 1 FROM scenarios WHERE id = ? AND owner = ?', (scenario_id, owner)).fetchone() is not None
+
+    @staticmethod
+    def _load_summary(db, scenario_id, owner):
+        row = db.execute(
+            'SELECT name, period, created_at, entry_count, cost_impact FROM scenarios WHERE id = ? AND owner = ?',
+            (scenario_id, owner)
+        ).fetchone()
+        if row is None:
+            return None
+        totals = {'customer': {}, 'bu': {}}
+        for dimension, key, cost_impact in db.execute(
+            'SELECT dimension, key, cost_impact FROM scenario_totals WHERE scenario_id = ?', (scenario_id,)
+        ):
+            totals[dimension][key] = cost_impact
+        return scenario_summary(scenario_id, *row, totals['customer'], totals['bu'])
+
+
+def open_scenario_store(path=SCENARIO_DB):
+    """SQLite-backed store when a database path is configured, in-memory otherwise"""
+    return SQLiteScenarioStore(path) if path else ScenarioStore()
@@ -0,0 +1,98 @@
+import bisect
+import re
+
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = r'[a-z0-9]+'
+
+SEARCH_COLUMNS = ['EmployeeName', 'EmployeeCode', 'Band', 'ProjectRole', 'Practice', 'PrismCustomerGroup']
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, text.lower())
+
+
+class TokenIndex:
+    """Row numbers of a frame by the lower-cased word tokens of some of its columns
+
+    The vocabulary is sorted so every token starting with a prefix is found
+    with two binary searches. Postings are stored as one array with offsets.
+    """
+
+    def __init__(self, df, columns):
+        parts = []
+        for column in columns:
+            tokens = df[column].dropna().astype(str).str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+            parts.append(pd.DataFrame({'token': tokens.to_numpy(dtype=object), 'row': tokens.index.to_numpy()}))
+        pairs = pd.concat(parts, ignore_index=True).drop_duplicates() if parts else pd.DataFrame({'token': [], 'row': []})
+
+        codes, vocabulary = pd.factorize(pairs['token'], sort=True)
+        rows = pairs['row'].to_numpy(dtype=np.int64)
+        order = np.lexsort((rows, codes))
+        self.vocabulary = list(vocabulary)
+        self.postings = rows[order]
+        self.offsets = np.searchsorted(codes[order], np.arange(len(self.vocabulary) + 1))
+
+    def prefix_rows(self, prefix):
+        """Sorted rows with a token starting with prefix"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\uffff', start)
+        if end - start == 1:
+            return self.postings[self.offsets[start]:self.offsets[end]]
+        return np.unique(self.postings[self.offsets[start]:self.offsets[end]])
+
+    def exact_rows(self, token):
+        """Sorted rows with exactly this token"""
+        position = bisect.bisect_left(self.vocabulary, token)
+        if position == len(self.vocabulary) or self.vocabulary[position] != token:
+            return self.postings[:0]
+        return self.postings[self.offsets[position]:self.offsets[position + 1]]
+
+
+class EmployeeSearchIndex:
+    """Prefix search over the employee pool
+
+    Every query word must prefix a word of one of SEARCH_COLUMNS. Each employee
+    is returned once, as its first matching row. Results are ranked by an exact
+    employee code, then the name starting with the query, then the number of
+    query words found in the name (whole words count more), then by name.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool.reset_index(drop=True)
+        self.index = TokenIndex(self.pool, SEARCH_COLUMNS)
+        self.name_index = TokenIndex(self.pool, ['EmployeeName'])
+        self.names = self.pool['EmployeeName'].fillna('').astype(str).str.lower().to_numpy(dtype=str)
+        self.codes = self.pool['EmployeeCode'].astype(str).to_numpy(dtype=str)
+        self.bus = self.pool['FinalBU'].to_numpy(dtype=object)
+
+    def search(self, query, user_bus=None, limit=50):
+        """Return (matching rows of the pool ranked and cut to limit, number of matching employees)
+
+        user_bus limits the rows as get_user_bus() does: None means every BU.
+        """
+        terms = tokenize(query)
+        if not terms or (user_bus is not None and len(user_bus) == 0):
+            return self.pool.iloc[0:0], 0
+
+        matched = self.index.prefix_rows(terms[0])
+        for term in terms[1:]:
+            matched = np.intersect1d(matched, self.index.prefix_rows(term), assume_unique=True)
+
+        if user_bus is not None:
+            matched = matched[np.isin(self.bus[matched], list(user_bus))]
+
+        # One result per employee
+        _, first = np.unique(self.codes[matched], return_index=True)
+        matched = matched[np.sort(first)]
+
+        query = query.strip().lower()
+        score = np.where(self.codes[matched] == query, 100, 0)
+        score += np.where(np.char.startswith(self.names[matched], query), 10, 0)
+        for term in terms:
+            score += np.where(np.isin(matched, self.name_index.prefix_rows(term), assume_unique=True), 2, 0)
+            score += np.where(np.isin(matched, self.name_index.exact_rows(term), assume_unique=True), 1, 0)
+
+        order = np.lexsort((matched, self.names[matched], -score))[:limit]
+        return self.pool.iloc[matched[order]].reset_index(drop=True), len(matched)
@@ -0,0 +1,149 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows, every worker loads its own data
+    fcntl = None
+
+from snapshot import map_table, pa, write_table
+
+logger = logging.getLogger(__name__)
+
+# e.g. /dev/shm/team-roster; empty keeps a private copy of the data per worker
+SHARED_DATA_DIR = os.environ.get('SHARED_DATA_DIR', '')
+
+
+def shared_data_enabled():
+    return pa is not None and fcntl is not None and bool(SHARED_DATA_DIR)
+
+
+class SharedFrame:
+    """A DataFrame loaded once per host and memory-mapped by every worker
+
+    The process that finds the published copy missing or older than ttl takes a
+    host-wide file lock, runs loader() and publishes the frame as an Arrow file
+    next to a manifest holding its generation. Everyone else maps the published
+    file read-only, so numeric and categorical columns are shared between
+    workers instead of copied.
+
+    loader(etag) is given the ETag of the published copy, or None when there is
+    none to reuse, and returns (etag, df), with df None while the data still
+    has that ETag. When the ETag matches the published copy only the
+    manifest's timestamp is renewed and the generation stays the same.
+    """
+
+    def __init__(self, name, loader, ttl=3600):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self._base = os.path.join(SHARED_DATA_DIR, name.replace('/', '_'))
+        self._attached = (None, None, None)
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._attached[0]
+
+    def attached(self):
+        """(frame, ETag) this process has mapped, or (None, None)"""
+        _, df, etag = self._attached
+        return df, etag
+
+    def load(self):
+        """Return the current published frame, publishing it first if needed"""
+        manifest = self._read_manifest()
+        if not self._is_current(manifest):
+            with self._host_lock():
+                # Another worker may have published while we waited
+                manifest = self._read_manifest()
+                if not self._is_current(manifest):
+                    manifest = self._publish(manifest)
+        return self._attach(manifest)
+
+    def _is_current(self, manifest):
+        return manifest is not None and time.time() - manifest['published_at'] < self.ttl
+
+    def _read_manifest(self):
+        try:
+            with open(f'{self._base}.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest):
+        tmp_path = f'{self._base}.json.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, f'{self._base}.json')
+
+    def _host_lock(self):
+        os.makedirs(SHARED_DATA_DIR, exist_ok=True)
+        return _FileLock(f'{self._base}.lock')
+
+    def _publish(self, manifest):
+        """Run the loader and publish its frame, must be called with the host lock held"""
+        published = manifest is not None and os.path.exists(manifest['path'])
+        etag, df = self.loader(manifest['etag'] if published else None)
+
+        if published and manifest['etag'] == etag:
+            manifest = dict(manifest, published_at=time.time())
+            self._write_manifest(manifest)
+            logger.info(f"Shared {self.name} data unchanged (generation {manifest['generation']})")
+            return manifest
+
+        generation = manifest['generation'] + 1 if manifest is not None else 1
+        path = f'{self._base}.{generation}.arrow'
+        write_table(path, df, {b'generation': str(generation).encode()})
+        manifest = {'generation': generation, 'etag': etag, 'path': path, 'published_at': time.time()}
+        self._write_manifest(manifest)
+        self._remove_old_generations(generation)
+        logger.info(f"Published shared {self.name} data (generation {generation})")
+        return manifest
+
+    def _remove_old_generations(self, generation):
+        # The previous generation is kept for workers that have just read the
+        # old manifest; mapped files stay readable after they are removed
+        for path in glob.glob(f'{glob.escape(self._base)}.*.arrow'):
+            try:
+                file_generation = int(path[len(self._base) + 1:-len('.arrow')])
+            except ValueError:
+                continue
+            if file_generation < generation - 1:
+                os.remove(path)
+
+    def _attach(self, manifest):
+        """Map the published generation, reusing the frame if it is already attached"""
+        generation, df, _ = self._attached
+        if generation == manifest['generation']:
+            return df
+
+        with self._lock:
+            generation, df, _ = self._attached
+            if generation != manifest['generation']:
+                # split_blocks keeps columns as separate views of the mapped file
+                df = map_table(manifest['path']).to_pandas(split_blocks=True)
+                self._attached = (manifest['generation'], df, manifest['etag'])
+            return df
+
+
+class _FileLock:
+    """Exclusive flock held for the duration of a with block"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
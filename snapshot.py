@@ -0,0 +1,89 @@
+import logging
+import os
+
+try:
+    import pyarrow as pa
+except ImportError:  # Snapshots are optional, loaders fall back to CSV
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+
+ETAG_KEY = b'source_etag'
+
+
+def snapshots_enabled():
+    return pa is not None and bool(SNAPSHOT_DIR)
+
+
+def snapshot_path(name):
+    """Map a blob name such as 'cost/Q1FY2026.csv' to its snapshot file"""
+    base = os.path.splitext(name)[0].replace('/', '_')
+    return os.path.join(SNAPSHOT_DIR, f'{base}.arrow')
+
+
+def read_snapshot(name, etag):
+    """Memory-map the snapshot of a blob, or None if it is missing or stale
+
+    The snapshot is only used when it was written from the blob version with
+    the given ETag.
+    """
+    if not snapshots_enabled():
+        return None
+
+    path = snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = map_table(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    metadata = table.schema.metadata or {}
+    if metadata.get(ETAG_KEY, b'').decode() != etag:
+        return None
+    return table.to_pandas()
+
+
+def write_snapshot(name, df, etag):
+    """Write df as an uncompressed Arrow IPC file tagged with the blob's ETag
+
+    Uncompressed IPC files can be memory-mapped without decoding. Failures are
+    logged and otherwise ignored.
+    """
+    if not snapshots_enabled():
+        return
+
+    path = snapshot_path(name)
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        write_table(path, df, {ETAG_KEY: etag.encode()})
+    except Exception as e:
+        logger.warning(f"Could not write snapshot {path}: {e}")
+
+
+def map_table(path):
+    """Read an Arrow IPC file through a memory map"""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def write_table(path, df, metadata):
+    """Write df to path as an uncompressed Arrow IPC file with extra schema metadata
+
+    The file is written under a temporary name and renamed, so readers never
+    see a partial file.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -29,11 +29,32 @@ document.addEventListener("alpine:init", () => {
 
     async loadTotalEmployees() {
       try {
-        const response = await fetch("/api/total-employees");
-        this.totalEmployees = await response.json();
+        // Compact columnar payload; the browser revalidates it with its ETag
+        const response = await fetch("/api/total-employees?format=compact");
+        this.totalEmployees = this.decodeCompactFrame(await response.json());
       } catch (e) {
         this.totalEmployees = [];
       }
+      return this.totalEmployees;
+    },
+
+    async getTotalEmployees() {
+      if (this.totalEmployees.length > 0) return this.totalEmployees;
+      return this.loadTotalEmployees();
+    },
+
+    // Turn a ?format=compact response back into an array of row objects
+    decodeCompactFrame(payload) {
+      const rows = Array.from({ length: payload.length }, () => ({}));
+      payload.columns.forEach((column) => {
+        const values = column.dictionary
+          ? column.codes.map((code) => (code === -1 ? null : column.dictionary[code]))
+          : column.values;
+        values.forEach((value, i) => {
+          rows[i][column.name] = value;
+        });
+      });
+      return rows;
     },
 
     async loadRosterEmployees() {
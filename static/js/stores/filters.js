@@ -637,13 +637,18 @@ document.addEventListener("alpine:init", () => {
 
     // API Methods
     updateFilters() {
-      const queryParams = new URLSearchParams({
-        month: this.month,
-        businessUnits: this.selectedBusinessUnits.join(","),
-        customers: this.selectedCustomers.join(","),
-        locations: this.selectedLocations.join(","),
-        billableStatus: this.selectedBillableStatus.join(","),
-      });
+      const queryParams = new URLSearchParams({ month: this.month });
+
+      // The server only narrows the roster; the roster table still applies the
+      // full selection (including "nothing selected") on top of it
+      const appendSelection = (name, selected, available) => {
+        if (selected.length === 0 || selected.length >= available.length) return;
+        selected.forEach((value) => queryParams.append(name, value));
+      };
+      appendSelection("businessUnits", this.selectedBusinessUnits, this.businessUnits);
+      appendSelection("customers", this.selectedCustomers, this.customers);
+      appendSelection("locations", this.selectedLocations, this.availableLocations);
+      appendSelection("billableStatus", this.selectedBillableStatus, this.availableBillableStatus);
 
       if (typeof updateFilteredGMData === "function") {
         updateFilteredGMData();
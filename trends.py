@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+TREND_MONTHS = ['M1', 'M2', 'M3', 'QTR']
+
+# Grain of the stored cost rollup
+TREND_KEYS = ['Quarter', 'Month', 'BU', 'Customer', 'Band', 'Location']
+
+# groupBy argument -> columns a trend is broken down by
+TREND_GROUPS = {
+    'total': [],
+    'bu': ['BU'],
+    'customer': ['BU', 'Customer'],
+    'band': ['BU', 'Band'],
+    'location': ['BU', 'Location'],
+}
+
+
+def rollup_cost(df, quarter):
+    """Allocated FTE and cost of one quarter's cost data by TREND_KEYS
+
+    Each month, and the quarter as 'QTR', gets its own rows.
+    """
+    keys = ['FinalBU', 'PrismCustomerGroup', 'Band', 'Offshore_Onsite']
+    values = [f'{measure}_{month}' for month in TREND_MONTHS for measure in ('AllocationFTECapped', 'AllocationCost')]
+    grouped = df.groupby(keys, observed=True)[values].sum().reset_index()
+
+    parts = []
+    for month in TREND_MONTHS:
+        part = grouped[keys].rename(columns={
+            'FinalBU': 'BU', 'PrismCustomerGroup': 'Customer', 'Offshore_Onsite': 'Location'
+        })
+        part.insert(0, 'Quarter', quarter)
+        part.insert(1, 'Month', month)
+        part['FTE'] = grouped[f'AllocationFTECapped_{month}'].to_numpy(dtype=np.float64)
+        part['Cost'] = grouped[f'AllocationCost_{month}'].to_numpy(dtype=np.float64)
+        parts.append(part)
+    return compact_rollup(pd.concat(parts, ignore_index=True))
+
+
+def rollup_revenue(prism, quarters, month_names):
+    """Revenue by quarter, month and customer for the given fiscal quarters
+
+    month_names(quarter) maps M1-M3 to month names such as 'Apr 25', as
+    get_quarter_months does; prism's Month holds their first word. Prism rows
+    are matched on Quarter and, when the column exists, FinancialYear. QTR
+    rows hold the quarter's whole revenue.
+    """
+    columns = ['Quarter', 'Month', 'BU', 'Customer', 'Revenue']
+    if prism.empty:
+        return pd.DataFrame(columns=columns)
+
+    parts = []
+    for quarter in quarters:
+        rows = prism[prism['Quarter'] == quarter[:2]]
+        if 'FinancialYear' in rows.columns:
+            rows = rows[rows['FinancialYear'] == quarter[2:]]
+        month_of = {name.split(' ')[0]: month for month, name in month_names(quarter).items() if month != 'QTR'}
+        revenue = pd.DataFrame({
+            'Quarter': quarter,
+            'Month': rows['Month'].map(month_of),
+            'BU': rows['BU'],
+            'Customer': rows['Title'],
+            'Revenue': rows['Total_Revenue'] * 1000000,
+        })
+        parts.append(revenue.dropna(subset=['Month']))
+        parts.append(revenue.assign(Month='QTR'))
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    revenue = pd.concat(parts, ignore_index=True)
+    return revenue.groupby(columns[:-1], observed=True, sort=False)['Revenue'].sum().reset_index()
+
+
+def compact_rollup(rollup):
+    """Store the key columns of a rollup as categories"""
+    return rollup.astype({key: 'category' for key in TREND_KEYS})
+
+
+def trend_series(cost, revenue, group_by, grain, bus=None, customers=(), quarters=()):
+    """Slice the rollups into FTE, cost, CPC, revenue and GM% per period
+
+    grain is 'quarter' for QTR rows or 'month' for M1-M3. bus limits the BUs
+    (None for all), customers and quarters narrow the result when not empty.
+    CPC is the monthly cost per allocated FTE, so quarter rows divide by 3 as
+    the CPC index does. Revenue only exists per BU and customer, so band and
+    location breakdowns have no revenue or GM%.
+    """
+    columns = TREND_GROUPS[group_by]
+    months = ['QTR'] if grain == 'quarter' else ['M1', 'M2', 'M3']
+
+    def select(df):
+        mask = df['Month'].isin(months).to_numpy()
+        if bus is not None:
+            mask &= df['BU'].isin(list(bus)).to_numpy()
+        if customers:
+            mask &= df['Customer'].isin(list(customers)).to_numpy()
+        if quarters:
+            mask &= df['Quarter'].isin(list(quarters)).to_numpy()
+        return df.loc[mask]
+
+    keys = ['Quarter', 'Month'] + columns
+    series = select(cost).groupby(keys, observed=True)[['FTE', 'Cost']].sum().reset_index()
+    series = series.astype({key: object for key in keys})
+    series['CPC'] = series['Cost'] / series['FTE'].replace(0, np.nan) / (3 if grain == 'quarter' else 1)
+
+    if 'Band' not in columns and 'Location' not in columns:
+        revenue = select(revenue).groupby(keys, observed=True)['Revenue'].sum().reset_index()
+        series = series.merge(revenue.astype({key: object for key in keys}), on=keys, how='outer')
+        series[['FTE', 'Cost', 'Revenue']] = series[['FTE', 'Cost', 'Revenue']].fillna(0)
+        series['GM%'] = (series['Revenue'] - series['Cost']) / series['Revenue'].replace(0, np.nan)
+
+    # Chronological order, Q4 ends the fiscal year
+    order = series['Quarter'].str[4:] + series['Quarter'].str[:2] + series['Month']
+    series = series.assign(_order=order).sort_values(['_order'] + columns, kind='stable').drop(columns='_order')
+    return series.replace([np.inf, -np.inf], np.nan).reset_index(drop=True)